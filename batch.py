@@ -0,0 +1,276 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+import loaders
+from instrument import span
+from render import render_document
+from render_cache import RenderCache
+
+REPORT_TYPES = ('chi_square', 'linear_regression', 'median', 'normal_distribution')
+
+# The inputs behind the shipped example reports (chi_square.tex, linear_regression.tex, ...)
+EXAMPLE_JOBS = [
+    {'type': 'chi_square', 'name': 'chi_square', 'observed': [[330, 196, 188], [17, 12, 13]],
+     'row_labels': ['stanovnici', 'oboljelo'], 'col_labels': ['A', 'B', 'C'], 'alpha': 0.1},
+    {'type': 'linear_regression', 'name': 'linear_regression', 'x': [1.0, 2.9, 3.6], 'y': [0.6, 1.1, 1.6]},
+    {'type': 'median', 'name': 'median', 'values': [12, 14, 15, 16, 18], 'frequencies': [2, 3, 3, 1, 1]},
+    {'type': 'normal_distribution', 'name': 'normal_distribution', 'mean': 106, 'std_dev': 6,
+     'queries': [['<', 100], ['<>', 109, 112], ['>', 112]]},
+]
+
+def _numbers(text):
+    return [float(x) for x in text.split()]
+
+def _rows(text):
+    return [_numbers(row) for row in text.split(';') if row.strip()]
+
+def _flag(text):
+    return text.strip().lower() in ('1', 'true', 'yes')
+
+def _queries(text):
+    queries = []
+    for query in text.split(';'):
+        if query.strip():
+            condition, *bounds = query.split()
+            queries.append([condition] + [float(b) for b in bounds])
+    return queries
+
+# How each CSV column is parsed; columns not listed here are kept as strings
+CSV_FIELDS = {
+    'observed': _rows,
+    'row_labels': str.split,
+    'col_labels': str.split,
+    'alpha': float,
+    'simulations': int,
+    'seed': int,
+    'x': _numbers,
+    'y': _numbers,
+    'values': _numbers,
+    'frequencies': _numbers,
+    'mean': float,
+    'std_dev': float,
+    'queries': _queries,
+    'layout': str,
+    'max_rows': int,
+    'backend': str,
+    'with_pdf': _flag,
+    'fmt': str,
+    'dpi': int,
+}
+
+# Job keys that override the batch-wide render options for that job
+JOB_RENDER_OPTIONS = ('backend', 'with_pdf', 'fmt', 'dpi')
+
+# Job keys choosing how the data table of linear_regression and median jobs is
+# laid out (see latex_emit.TABLE_LAYOUTS)
+JOB_TABLE_OPTIONS = ('layout', 'max_rows')
+
+def load_jobs(path):
+    """
+    Read jobs from a JSONL or CSV job file.
+
+    Every job has a 'type' (one of REPORT_TYPES), an optional 'name' used for the
+    output files, optional render overrides (JOB_RENDER_OPTIONS, e.g.
+    "backend": "dvi") and the inputs of that report. The table inputs
+    (observed, x/y, values/frequencies) may instead come from a 'file' read by
+    the loaders module (.csv, .txt, .npy, .npz):
+        chi_square: observed, row_labels, col_labels, alpha, and optionally
+            simulations and seed for a Monte Carlo p-value
+        linear_regression: x, y, and optionally layout and max_rows
+        median: values, frequencies, and optionally layout and max_rows
+        normal_distribution: mean, std_dev, queries
+    In CSV files lists are space-separated and table rows / queries are separated
+    by ';', e.g. observed="330 196 188; 17 12 13" or queries="< 100; <> 109 112".
+
+    Returns:
+    list of dict: The jobs, in file order
+    """
+    jobs = []
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(f):
+                jobs.append({key: CSV_FIELDS.get(key, str)(value)
+                             for key, value in row.items() if value not in (None, '')})
+        else:
+            for line in f:
+                if line.strip():
+                    jobs.append(json.loads(line))
+    for idx, job in enumerate(jobs):
+        if job.get('type') not in REPORT_TYPES:
+            raise ValueError(f"Job {idx}: unknown type {job.get('type')!r}, expected one of {REPORT_TYPES}")
+        job.setdefault('name', f"{job['type']}_{idx}")
+    return jobs
+
+def _integer(x):
+    if float(x).is_integer():
+        return int(x)
+    return x
+
+def build_job_document(job, fast=True):
+    """
+    Compute a job and build its report document without rendering it.
+    fast=False builds it from pylatex objects (see the report build_document functions).
+
+    Returns:
+    pylatex.Document: The report for the job
+    """
+    table_options = {key: job[key] for key in JOB_TABLE_OPTIONS if key in job}
+    if job['type'] == 'chi_square':
+        import chi_square
+        if 'file' in job:
+            observed = loaders.load_contingency_table(job['file'])
+        else:
+            observed = np.array(job['observed']).astype(int)
+        alpha = job.get('alpha', 0.05)
+        result = chi_square.chi_square_test(observed, alpha=alpha, simulations=job.get('simulations'),
+                                            seed=job.get('seed'))
+        row_labels = job.get('row_labels', [str(i + 1) for i in range(observed.shape[0])])
+        col_labels = job.get('col_labels', [chr(ord('A') + i) for i in range(observed.shape[1])])
+        return chi_square.build_document(result['observed'], result['expected'],
+                                         result['chi2_statistic'].round(2), result['degrees_of_freedom'],
+                                         alpha, row_labels, col_labels, fast=fast,
+                                         simulated_p_value=result.get('simulated_p_value'),
+                                         simulations=result.get('simulations'))
+    elif job['type'] == 'linear_regression':
+        import linear_regression
+        x_values, y_values = loaders.load_xy(job['file']) if 'file' in job else (job['x'], job['y'])
+        x_values = np.round(np.asarray(x_values, dtype=float), 2)
+        y_values = np.round(np.asarray(y_values, dtype=float), 2)
+        return linear_regression.build_document(x_values, y_values, fast=fast, **table_options)
+    elif job['type'] == 'median':
+        import median
+        if 'file' in job:
+            values, frequencies = loaders.load_frequency_table(job['file'])
+        else:
+            values, frequencies = job['values'], job['frequencies']
+        values = np.asarray(values, dtype=float)
+        frequencies = np.asarray(frequencies).astype(int)
+        return median.build_document(values, frequencies, fast=fast, **table_options)
+    else:
+        import normal_distribution
+        queries = [[condition] + [_integer(b) for b in bounds] for condition, *bounds in job['queries']]
+        return normal_distribution.build_document(float(job['mean']), float(job['std_dev']), queries, fast=fast)
+
+def run_job(job, output_dir='.', **render_options):
+    """
+    Compute and render a single job. Extra keyword arguments (cache, dpi, fmt,
+    format_dir, pages, ...) are passed to render.render_document.
+
+    Returns:
+    dict: Job name and type plus the paths of the generated files
+    """
+    filename = os.path.join(output_dir, job['name'])
+    render_options.update((key, job[key]) for key in JOB_RENDER_OPTIONS if key in job)
+    with span('report', report=job['type'], name=job['name']):
+        with span('build'):
+            doc = build_job_document(job)
+        files = render_document(doc, filename, **render_options)
+    return dict(name=job['name'], type=job['type'], **files)
+
+def _run_job_safe(job, output_dir, **render_options):
+    try:
+        return run_job(job, output_dir, **render_options)
+    except Exception as e:
+        return {'name': job['name'], 'type': job['type'], 'error': f"{type(e).__name__}: {e}"}
+
+def run_batch(jobs, output_dir='.', workers=None, **render_options):
+    """
+    Render many jobs through one worker pool.
+
+    Parameters:
+    jobs: list of dict
+        Jobs as returned by load_jobs
+    output_dir: str
+        Directory receiving the '<name>.tex/.pdf/.png' files of every job
+    workers: int, optional
+        Number of worker processes (default: number of CPUs); 1 runs in-process
+    render_options:
+        Passed to render.render_document (cache, dpi, fmt, format_dir, pages, ...).
+        A RenderCache is shared through its directory, so every worker sees the
+        entries of the others
+
+    Returns:
+    list of dict: One result per job, in job order; failed jobs carry an 'error'
+    """
+    names = [job['name'] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Job names must be unique, they are used as output file names")
+    os.makedirs(output_dir, exist_ok=True)
+    run = partial(_run_job_safe, output_dir=output_dir, **render_options)
+    if workers == 1:
+        return [run(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, jobs))
+
+def run_combined(jobs, output_dir='.', filename='problem_set', **render_options):
+    """
+    Render all jobs as one problem set: a single LaTeX run for the whole set,
+    split afterwards into the usual per-job PDF and preview. Per-job render
+    overrides are ignored, the whole set is compiled with the same options.
+
+    Returns:
+    dict: See problem_set.ProblemSet.render
+    """
+    from problem_set import ProblemSet
+    problems = ProblemSet()
+    for job in jobs:
+        problems.add(job['name'], build_job_document(job))
+    return problems.render(output_dir, filename, **render_options)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every job of a JSONL/CSV job file.")
+    parser.add_argument('jobs', help="path to a .jsonl or .csv job file")
+    parser.add_argument('-o', '--output-dir', default='.', help="directory for the generated files")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--dpi', type=int, default=200, help="resolution of the preview images")
+    parser.add_argument('--fmt', default='png', help="image format of the previews")
+    parser.add_argument('--pages', nargs='+', default=['1'], help="pages to rasterize, or 'all' (default: 1)")
+    parser.add_argument('--raster-workers', type=int, default=1, help="pages rasterized in parallel per job")
+    parser.add_argument('--backend', choices=['pdf', 'dvi'], default='pdf',
+                        help="'dvi' renders png/svg straight from the DVI file, skipping the PDF")
+    parser.add_argument('--with-pdf', action='store_true', help="also produce the PDF with the dvi backend")
+    parser.add_argument('--cache-dir', help="reuse rendered artifacts from this render cache")
+    parser.add_argument('--cache-size', type=int, default=512, help="render cache size limit in MB")
+    parser.add_argument('--format-dir', help="compile against precompiled preamble formats kept in this directory")
+    parser.add_argument('--combined', metavar='NAME',
+                        help="compile all jobs as one document NAME.pdf and split it per job (no cache, one process)")
+    parser.add_argument('--spans', metavar='FILE', help="append per-phase timing spans as JSON lines to FILE")
+    args = parser.parse_args()
+
+    if args.spans:
+        import instrument
+        # Through the environment, worker processes started with 'spawn' write to the same file
+        os.environ['ZADAR_SPANS'] = args.spans
+        instrument.add_sink(instrument.JsonLinesSink(args.spans))
+
+    cache = None
+    if args.cache_dir:
+        cache = RenderCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    pages = None if args.pages == ['all'] else [int(page) for page in args.pages]
+    if args.combined:
+        result = run_combined(load_jobs(args.jobs), args.output_dir, args.combined, dpi=args.dpi, fmt=args.fmt,
+                              format_dir=args.format_dir, pages=pages[0] if pages and len(pages) == 1 else pages,
+                              raster_workers=args.raster_workers, backend=args.backend,
+                              with_pdf=True if args.with_pdf else None)
+        print(f"Rendered {len(result['problems'])} problems from '{result['tex']}' into '{args.output_dir}'")
+        raise SystemExit()
+    results = run_batch(load_jobs(args.jobs), args.output_dir, args.workers,
+                        cache=cache, dpi=args.dpi, fmt=args.fmt, format_dir=args.format_dir,
+                        pages=pages[0] if pages and len(pages) == 1 else pages,
+                        raster_workers=args.raster_workers, backend=args.backend,
+                        with_pdf=True if args.with_pdf else None)
+    failed = [r for r in results if 'error' in r]
+    for r in failed:
+        print(f"{r['name']}: {r['error']}")
+    print(f"Rendered {len(results) - len(failed)} of {len(results)} jobs into '{args.output_dir}'")
+    if cache is not None:
+        hits = sum(1 for r in results if r.get('cached'))
+        stats = cache.stats()
+        print(f"Render cache: {hits} hits, {len(results) - len(failed) - hits} misses, "
+              f"{stats['entries']} entries using {stats['bytes']} of {stats['max_bytes']} bytes")
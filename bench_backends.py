@@ -0,0 +1,37 @@
+import argparse
+import os
+import statistics
+import tempfile
+
+from pdf2image import convert_from_path
+
+from batch import EXAMPLE_JOBS, build_job_document
+from bench_timing import timed
+from render import render_document
+
+def legacy_render(job, directory):
+    """
+    The original pipeline: pylatex generate_pdf() followed by convert_from_path().
+    """
+    filename = os.path.join(directory, job['name'])
+    build_job_document(job, fast=False).generate_pdf(filename, clean_tex=False)
+    image = convert_from_path(f'{filename}.pdf')
+    image[0].save(f'{filename}.png', 'PNG')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the render backends on the shipped example reports.")
+    parser.add_argument('-n', '--repeat', type=int, default=5, help="runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    variants = {
+        'legacy pdf+poppler': lambda job, doc, tmp: legacy_render(job, tmp),
+        'pdf backend (png)': lambda job, doc, tmp: render_document(doc, in_memory=True),
+        'dvi backend (png)': lambda job, doc, tmp: render_document(doc, in_memory=True, backend='dvi'),
+        'dvi backend (svg)': lambda job, doc, tmp: render_document(doc, in_memory=True, backend='dvi', fmt='svg'),
+    }
+    print(f"{'report':<22}" + ''.join(f'{name:>20}' for name in variants))
+    with tempfile.TemporaryDirectory() as tmp:
+        for job in EXAMPLE_JOBS:
+            doc = build_job_document(job)
+            times = [statistics.median(timed(lambda: render(job, doc, tmp), args.repeat)[0]) for render in variants.values()]
+            print(f"{job['name']:<22}" + ''.join(f'{t * 1000:>18.1f}ms' for t in times))
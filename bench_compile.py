@@ -0,0 +1,37 @@
+import argparse
+import os
+import statistics
+import subprocess
+import tempfile
+
+from batch import EXAMPLE_JOBS, build_job_document
+from bench_timing import timed
+from latex_format import compile_with_format, ensure_format, split_preamble
+
+def compile_cold(tex, filename, compiler='pdflatex'):
+    """
+    Compile `tex` with a single plain pdflatex run, loading the whole preamble.
+    """
+    dest_dir, jobname = os.path.split(os.path.abspath(filename))
+    with open(filename + '.tex', 'w', encoding='utf-8') as f:
+        f.write(tex)
+    subprocess.check_output([compiler, '-interaction=nonstopmode', jobname + '.tex'],
+                            stderr=subprocess.STDOUT, cwd=dest_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cold pdflatex runs with runs against a precompiled preamble.")
+    parser.add_argument('-n', '--repeat', type=int, default=5, help="runs per example (median is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        format_dir = os.path.join(tmp, 'formats')
+        print(f"{'report':<22}{'format build':>14}{'cold':>10}{'warm':>10}{'speedup':>10}")
+        for job in EXAMPLE_JOBS:
+            tex = build_job_document(job).dumps()
+            filename = os.path.join(tmp, job['name'])
+
+            (build,), _ = timed(lambda: ensure_format(split_preamble(tex)[0], format_dir), 1)
+
+            cold = statistics.median(timed(lambda: compile_cold(tex, filename), args.repeat)[0])
+            warm = statistics.median(timed(lambda: compile_with_format(tex, filename, format_dir), args.repeat)[0])
+            print(f"{job['name']:<22}{build:>13.3f}s{cold:>9.3f}s{warm:>9.3f}s{cold / warm:>9.1f}x")
@@ -0,0 +1,50 @@
+import argparse
+
+import numpy as np
+
+import chi_square
+import linear_regression
+import median
+import normal_distribution
+from bench_timing import timed
+
+def report_builders(size, rng):
+    """
+    One document builder per report type for an input of the given size,
+    each taking fast=True/False.
+    """
+    rows = max(2, int(np.sqrt(size)))
+    observed = rng.integers(1, 100, (rows, max(2, size // rows)))
+    result = chi_square.chi_square_test(observed)
+    row_labels = [f'r{i}' for i in range(observed.shape[0])]
+    col_labels = [f'c{i}' for i in range(observed.shape[1])]
+    x_values = np.round(rng.normal(10, 3, size), 2)
+    y_values = np.round(2 * x_values + rng.normal(0, 1, size), 2)
+    values = np.arange(size, dtype=float)
+    frequencies = rng.integers(1, 10, size)
+    queries = [('<>', 90 + i % 10, 110 + i % 10) for i in range(size)]
+    return {
+        'chi_square': lambda fast: chi_square.build_document(
+            result['observed'], result['expected'], result['chi2_statistic'].round(2),
+            result['degrees_of_freedom'], 0.05, row_labels, col_labels, fast=fast).dumps(),
+        'linear_regression': lambda fast: linear_regression.build_document(x_values, y_values, fast=fast).dumps(),
+        'median': lambda fast: median.build_document(values, frequencies, fast=fast).dumps(),
+        'normal_distribution': lambda fast: normal_distribution.build_document(100.0, 15.0, queries, fast=fast).dumps(),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time .tex emission with pylatex objects against latex_emit.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                        help="table cells / data points / values / queries per report")
+    parser.add_argument('-n', '--repeat', type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'report':<22}{'size':>8}{'pylatex':>12}{'latex_emit':>12}{'speedup':>10}")
+    for size in args.sizes:
+        for name, build in report_builders(size, rng).items():
+            if build(False) != build(True):
+                raise AssertionError(f"{name}: emitters disagree for size {size}")
+            slow = min(timed(lambda: build(False), args.repeat)[0])
+            fast = min(timed(lambda: build(True), args.repeat)[0])
+            print(f"{name:<22}{size:>8}{slow * 1000:>10.2f}ms{fast * 1000:>10.2f}ms{slow / fast:>9.1f}x")
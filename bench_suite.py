@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import scipy.stats  # The reports import it lazily; loaded here so it is not timed as part of a phase
+
+import chi_square
+import linear_regression
+import median
+import normal_distribution
+from bench_timing import timed
+from frequency_stats import frequency_statistics
+from rasterize import rasterize_pdf
+from regression_stats import regression_moments, regression_summary
+from render import compile_tex
+
+PHASES = ('compute', 'emit', 'compile', 'rasterize')
+
+# External programs each phase needs; phases whose programs are missing are skipped.
+# Rasterizing needs a compiled PDF, so it needs pdflatex as well
+PHASE_PROGRAMS = {'compile': ('pdflatex',), 'rasterize': ('pdflatex', 'pdftoppm')}
+
+def chi_square_case(rng, rows, cols):
+    observed = rng.integers(1, 100, (rows, cols))
+    row_labels = [f'r{i}' for i in range(rows)]
+    col_labels = [f'c{i}' for i in range(cols)]
+    compute = lambda: chi_square.chi_square_test(observed)
+    emit = lambda result: chi_square.build_document(
+        result['observed'], result['expected'], result['chi2_statistic'].round(2),
+        result['degrees_of_freedom'], 0.05, row_labels, col_labels).dumps()
+    return {'rows': rows, 'cols': cols}, compute, emit
+
+def linear_regression_case(rng, points):
+    x_values = np.round(rng.normal(10, 3, points), 2)
+    y_values = np.round(2 * x_values + rng.normal(0, 1, points), 2)
+    compute = lambda: regression_summary(regression_moments(x_values, y_values))
+    # build_document derives its statistics itself, so emission includes them
+    emit = lambda result: linear_regression.build_document(x_values, y_values).dumps()
+    return {'points': points}, compute, emit
+
+def median_case(rng, distinct, total):
+    values = np.arange(distinct, dtype=float)
+    frequencies = np.bincount(rng.integers(0, distinct, total), minlength=distinct)
+    compute = lambda: frequency_statistics(values, frequencies)
+    emit = lambda result: median.build_document(values, frequencies).dumps()
+    return {'distinct': distinct, 'total_frequency': total}, compute, emit
+
+def normal_distribution_case(rng, count):
+    lower = rng.integers(70, 130, count)
+    queries = [('<>', int(low), int(low) + 10) if i % 3 == 0 else ('<' if i % 3 == 1 else '>', int(low))
+               for i, low in enumerate(lower)]
+    compute = lambda: normal_distribution.evaluate_queries(
+        100.0, 15.0, *normal_distribution._query_arrays(queries))
+    emit = lambda result: normal_distribution.build_document(100.0, 15.0, queries, result=result).dumps()
+    return {'queries': count}, compute, emit
+
+def run_case(report, params, compute, emit, phases, repeat, dpi):
+    """
+    Time the phases of one report for one input size.
+
+    Returns:
+    list of dict: One record per phase with the report, its size parameters,
+    every run time and their min and median
+    """
+    measured = {}
+    with tempfile.TemporaryDirectory(prefix='zadar-bench-') as workdir:
+        # Later phases need the output of the earlier ones even when those are not reported
+        measured['compute'], result = timed(compute, repeat if 'compute' in phases else 1)
+        measured['emit'], tex = timed(lambda: emit(result), repeat if 'emit' in phases else 1)
+        if 'compile' in phases or 'rasterize' in phases:
+            measured['compile'], pdf_path = timed(lambda: compile_tex(tex, workdir), repeat if 'compile' in phases else 1)
+        if 'rasterize' in phases:
+            target = os.path.join(workdir, 'page.png')
+            measured['rasterize'], _ = timed(lambda: rasterize_pdf(pdf_path, [target], dpi=dpi), repeat)
+    return [{'report': report, 'params': params, 'phase': phase, 'runs': measured[phase],
+             'min': min(measured[phase]), 'median': statistics.median(measured[phase])}
+            for phase in PHASES if phase in phases]
+
+def metadata(args):
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'dpi': args.dpi,
+    }
+
+def _record_key(record):
+    return record['report'], json.dumps(record['params'], sort_keys=True), record['phase']
+
+def compare(results, baseline):
+    """
+    Median time of every record relative to the matching baseline record.
+
+    Returns:
+    list of tuple: (record, ratio) for records found in the baseline
+    """
+    previous = {_record_key(record): record for record in baseline['results']}
+    return [(record, record['median'] / previous[_record_key(record)]['median'])
+            for record in results if _record_key(record) in previous]
+
+def _pairs(text):
+    first, second = text.lower().split('x')
+    return int(first), int(second)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the statistics, .tex emission, pdflatex and rasterization "
+                                                 "phases of every report for growing inputs.")
+    parser.add_argument('--tables', type=_pairs, nargs='*', default=[(2, 3), (10, 10), (40, 40)],
+                        help="chi_square contingency table sizes, ROWSxCOLS")
+    parser.add_argument('--points', type=int, nargs='*', default=[10, 100, 1000], help="linear_regression points")
+    parser.add_argument('--frequency-tables', type=_pairs, nargs='*', default=[(5, 10), (100, 10000), (1000, 10 ** 6)],
+                        help="median tables, DISTINCTxTOTAL (distinct values x total frequency)")
+    parser.add_argument('--queries', type=int, nargs='*', default=[3, 30, 300], help="normal_distribution queries")
+    parser.add_argument('--phases', nargs='+', choices=PHASES, default=list(PHASES), help="phases to time")
+    parser.add_argument('-n', '--repeat', type=int, default=5, help="runs per measurement")
+    parser.add_argument('--dpi', type=int, default=200, help="resolution of the rasterized page")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the generated inputs")
+    parser.add_argument('-o', '--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="median slowdown relative to the baseline that counts as a regression (default 1.2)")
+    args = parser.parse_args()
+
+    phases = []
+    for phase in args.phases:
+        missing = [program for program in PHASE_PROGRAMS.get(phase, ()) if shutil.which(program) is None]
+        if missing:
+            print(f"Skipping the {phase} phase: {', '.join(missing)} not found", file=sys.stderr)
+        else:
+            phases.append(phase)
+    sizes = {
+        'chi_square': (chi_square_case, args.tables),
+        'linear_regression': (linear_regression_case, [(points,) for points in args.points]),
+        'median': (median_case, args.frequency_tables),
+        'normal_distribution': (normal_distribution_case, [(queries,) for queries in args.queries]),
+    }
+    # Every case has its own generator, so its input does not depend on which other cases run
+    cases = [(report, make_case(np.random.default_rng([args.seed, number, *size]), *size))
+             for number, (report, (make_case, report_sizes)) in enumerate(sizes.items())
+             for size in report_sizes]
+
+    results = []
+    print(f"{'report':<22}{'size':<40}" + ''.join(f'{phase:>12}' for phase in phases))
+    for report, (params, compute, emit) in cases:
+        records = run_case(report, params, compute, emit, phases, args.repeat, args.dpi)
+        results.extend(records)
+        size = ', '.join(f'{key}={value}' for key, value in params.items())
+        print(f"{report:<22}{size:<40}" + ''.join(f"{record['median'] * 1000:>10.2f}ms" for record in records))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': metadata(args), 'results': results}, f, indent=1)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = 0
+        print(f"\nMedian time relative to {args.compare} (commit {baseline['meta'].get('commit')}):")
+        for record, ratio in compare(results, baseline):
+            flag = '  REGRESSION' if ratio > args.threshold else ''
+            regressions += bool(flag)
+            size = ', '.join(f'{key}={value}' for key, value in record['params'].items())
+            print(f"{record['report']:<22}{size:<40}{record['phase']:<12}{ratio:>8.2f}x{flag}")
+        sys.exit(1 if regressions else 0)
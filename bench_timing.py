@@ -0,0 +1,15 @@
+import time
+
+def timed(fn, repeat):
+    """
+    Run `fn` `repeat` times.
+
+    Returns:
+    tuple: (list of run times in seconds, result of the last run)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
@@ -1,9 +1,185 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import numpy as np
-from scipy.stats import chi2_contingency, chisquare, chi2
-from pylatex import Document, Tabular, NoEscape
-from pdf2image import convert_from_path
+from instrument import span
+from render import render_document
+from latex_emit import emitter
+
+# scipy.stats is imported inside the functions that need it: it takes longer to
+# import than most runs take to compute
+
+# Table cells drawn per simulation chunk (and per worker process). Peak memory is
+# a few times this in 8-byte values: the int64 tables plus float temporaries
+SIMULATION_CELLS = 10 ** 7
+
+# Tables per simulation chunk for tables small enough that the cell budget is not the limit
+SIMULATION_CHUNK = 10000
+
+def _marginals(observed, block_size):
+    """
+    Row sums, column sums and grand total of a 2D table, reading `block_size` rows at a time.
+    """
+    n_rows, n_cols = observed.shape
+    row_sums = np.empty(n_rows)
+    col_sums = np.zeros(n_cols)
+    for start in range(0, n_rows, block_size):
+        block = np.asarray(observed[start:start + block_size], dtype=float)
+        row_sums[start:start + block_size] = block.sum(axis=1)
+        col_sums += block.sum(axis=0)
+    return row_sums, col_sums, row_sums.sum()
+
+def _block_statistic(observed, start, stop, row_sums, col_sums, total, correction):
+    block = np.asarray(observed[start:stop], dtype=float)
+    expected = np.outer(row_sums[start:stop], col_sums) / total
+    diff = block - expected
+    if correction:
+        diff = np.sign(diff) * np.maximum(np.abs(diff) - 0.5, 0)
+    return np.sum(diff ** 2 / expected)
+
+def expected_frequencies(observed):
+    """
+    Expected frequencies of a contingency table under independence.
+    """
+    observed = np.asarray(observed, dtype=float)
+    row_sums = observed.sum(axis=1)
+    col_sums = observed.sum(axis=0)
+    return np.outer(row_sums, col_sums) / row_sums.sum()
+
+def chi_square_blockwise(observed, block_size=1024, workers=None):
+    """
+    Chi-square statistic of independence computed block by block from the marginals.
+
+    The expected frequency matrix is never materialized; memory use is bounded by
+    `block_size` rows of the table, so `observed` can be a np.memmap of a table that
+    does not fit in memory.
+
+    Parameters:
+    observed: array-like
+        2D contingency table (np.ndarray or np.memmap)
+    block_size: int, optional
+        Number of table rows processed at once (default 1024)
+    workers: int, optional
+        Number of threads computing blocks in parallel (default: sequential)
+
+    Returns:
+    tuple: (chi2_statistic, p_value, degrees_of_freedom)
+    """
+    n_rows, n_cols = observed.shape
+    dof = (n_rows - 1) * (n_cols - 1)
+    row_sums, col_sums, total = _marginals(observed, block_size)
+    if np.any(row_sums == 0) or np.any(col_sums == 0):
+        raise ValueError("The internally computed table of expected frequencies has a zero element")
+    if dof == 0:
+        return 0.0, 1.0, dof
+
+    starts = range(0, n_rows, block_size)
+    def block(start):
+        return _block_statistic(observed, start, start + block_size, row_sums, col_sums, total, dof == 1)
+    if workers is not None and workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chi2_stat = sum(executor.map(block, starts))
+    else:
+        chi2_stat = sum(block(start) for start in starts)
+    from scipy.stats import chi2
+    return chi2_stat, chi2.sf(chi2_stat, dof), dof
+
+def random_tables(row_sums, col_sums, size, rng):
+    """
+    Random contingency tables with the given marginals, drawn from their exact
+    distribution under independence (Patefield's algorithm).
+
+    Each cell is a hypergeometric draw given the cells before it; every draw is
+    made for all `size` tables at once.
+
+    Returns:
+    np.ndarray: (size, r, c) integer tables
+    """
+    row_sums = np.asarray(row_sums, dtype=np.int64)
+    col_sums = np.asarray(col_sums, dtype=np.int64)
+    n_rows, n_cols = len(row_sums), len(col_sums)
+    tables = np.empty((size, n_rows, n_cols), dtype=np.int64)
+    col_left = np.tile(col_sums, (size, 1))
+    for i in range(n_rows - 1):
+        row_left = np.full(size, row_sums[i])
+        rest = col_left.sum(axis=1)
+        for j in range(n_cols - 1):
+            rest -= col_left[:, j]  # Observations left in the columns after j
+            cell = rng.hypergeometric(col_left[:, j], rest, row_left)
+            tables[:, i, j] = cell
+            col_left[:, j] -= cell
+            row_left -= cell
+        tables[:, i, -1] = row_left
+        col_left[:, -1] -= row_left
+    tables[:, -1] = col_left
+    return tables
+
+def _count_exceeding(seed, size, observed, expected, statistic):
+    rng = np.random.default_rng(seed)
+    if observed.ndim == 2:
+        tables = random_tables(observed.sum(axis=1), observed.sum(axis=0), size, rng)
+    else:
+        tables = rng.multinomial(observed.sum(), expected / expected.sum(), size)
+    stats = np.sum((tables - expected) ** 2 / expected, axis=tuple(range(1, tables.ndim)))
+    # Same tolerance as R's chisq.test, so ties with the observed table are not lost to rounding
+    return int(np.count_nonzero(stats >= statistic * (1 - 64 * np.finfo(float).eps)))
+
+def simulate_p_value(observed, expected=None, simulations=10000, seed=None, processes=None, chunk_size=None):
+    """
+    Monte Carlo p-value of the chi-square statistic, reliable where small expected
+    counts make the asymptotic chi-square distribution a poor approximation.
+
+    For a 2D table, random tables with the observed row and column sums are drawn
+    (see random_tables); for goodness of fit, multinomial samples from `expected`.
+    The statistic is compared without Yates' correction.
+
+    Parameters:
+    observed: array-like
+        2D contingency table or 1D observed frequencies
+    expected: array-like, optional
+        Expected frequencies for goodness of fit (default uniform)
+    simulations: int, optional
+        Number of random tables (default 10000)
+    seed: int, optional
+        Seed making the result reproducible. Tables are drawn in chunks of
+        `chunk_size`, each from its own child seed, so the result does not
+        depend on `processes` (it does depend on `chunk_size`)
+    processes: int, optional
+        Number of worker processes (default: all chunks in this process)
+    chunk_size: int, optional
+        Tables drawn per NumPy batch; bounds the memory used (default: at most
+        SIMULATION_CHUNK tables and SIMULATION_CELLS cells)
+
+    Returns:
+    tuple: (p_value, chi2_statistic, seed entropy to reproduce the run)
+    """
+    observed = np.asarray(observed, dtype=np.int64)
+    if observed.ndim == 2:
+        expected = expected_frequencies(observed)
+    elif expected is None:
+        expected = np.full(observed.shape, observed.sum() / len(observed))
+    else:
+        expected = np.asarray(expected, dtype=float)
+    if np.any(expected <= 0):
+        raise ValueError("The table of expected frequencies has a zero element")
+    statistic = np.sum((observed - expected) ** 2 / expected)
+
+    if chunk_size is None:
+        chunk_size = min(SIMULATION_CHUNK, max(1, SIMULATION_CELLS // observed.size))
+    seeds = np.random.SeedSequence(seed)
+    sizes = [min(chunk_size, simulations - start) for start in range(0, simulations, chunk_size)]
+    count = partial(_count_exceeding, observed=observed, expected=expected, statistic=statistic)
+    with span('simulate', report='chi_square', simulations=simulations, processes=processes or 1):
+        if processes is not None and processes > 1 and len(sizes) > 1:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                exceeding = sum(executor.map(count, seeds.spawn(len(sizes)), sizes))
+        else:
+            exceeding = sum(map(count, seeds.spawn(len(sizes)), sizes))
+    return (1 + exceeding) / (simulations + 1), statistic, seeds.entropy
 
-def chi_square_test(observed, expected=None, alpha=0.05):
+def chi_square_test(observed, expected=None, alpha=0.05, block_size=None, workers=None,
+                    simulations=None, seed=None, processes=None, chunk_size=None):
     """
     Perform a chi-square test on the provided data.
     
@@ -15,56 +191,191 @@ def chi_square_test(observed, expected=None, alpha=0.05):
         Expected frequencies (only for goodness of fit test)
     alpha: float, optional
         Significance level (default 0.05)
+    block_size: int, optional
+        Compute the independence test block by block with chi_square_blockwise
+        instead of chi2_contingency. The result then holds no expected table
+        ('expected' is None); use expected_frequencies when it is needed
+    workers: int, optional
+        Threads used by the blockwise computation
+    simulations: int, optional
+        Also compute a Monte Carlo p-value from this many random tables (see
+        simulate_p_value). The result then holds 'simulated_p_value',
+        'simulations' and 'simulation_seed', and 'significant' is decided by
+        the simulated p-value
+    seed: int, optional
+        Seed of the simulation
+    processes: int, optional
+        Worker processes of the simulation
+    chunk_size: int, optional
+        Tables drawn per simulation chunk (see simulate_p_value)
         
     Returns:
     dict: Contains test statistics, p-value, and test conclusion
     """
+    from scipy.stats import chi2_contingency, chisquare
     try:
-        # Check if we're doing an independence test (2D array)
-        if isinstance(observed, (list, np.ndarray)) and np.array(observed).ndim == 2:
-            # Perform chi-square test of independence
-            chi2_stat, p_value, dof, expected = chi2_contingency(observed)
-            test_type = "independence"
-        else:
-            if expected is None:
-                # If no expected frequencies provided, assume uniform distribution
-                expected = np.ones_like(observed) * np.sum(observed) / len(observed)
-            chi2_stat, p_value = chisquare(observed, expected)
-            dof = len(observed) - 1
-            test_type = "goodness of fit"
+        with span('compute', report='chi_square') as s:
+            # Check if we're doing an independence test (2D array)
+            if isinstance(observed, (list, np.ndarray)) and np.ndim(observed) == 2:
+                if block_size is not None:
+                    observed = observed if isinstance(observed, np.ndarray) else np.asarray(observed)
+                    chi2_stat, p_value, dof = chi_square_blockwise(observed, block_size, workers)
+                else:
+                    # Perform chi-square test of independence
+                    chi2_stat, p_value, dof, expected = chi2_contingency(observed)
+                test_type = "independence"
+            else:
+                if expected is None:
+                    # If no expected frequencies provided, assume uniform distribution
+                    expected = np.ones_like(observed) * np.sum(observed) / len(observed)
+                chi2_stat, p_value = chisquare(observed, expected)
+                dof = len(observed) - 1
+                test_type = "goodness of fit"
+            if s:
+                s.set(size=int(np.size(observed)), test_type=test_type)
         
         # Prepare results
         result = {
             'test_type': test_type,
-            'chi2_statistic': chi2_stat,
+            'chi2_statistic': np.float64(chi2_stat),
             'p_value': p_value,
             'degrees_of_freedom': dof,
             'significant': p_value < alpha,
             'alpha': alpha,
-            'observed': np.array(observed),
-            'expected': np.array(expected)
+            'observed': np.asarray(observed),
+            'expected': None if expected is None else np.asarray(expected)
         }
+        if simulations:
+            simulated_p_value, _, entropy = simulate_p_value(
+                observed, expected if test_type == "goodness of fit" else None, simulations, seed, processes,
+                chunk_size)
+            result.update(simulated_p_value=simulated_p_value, simulations=simulations,
+                          simulation_seed=entropy, significant=simulated_p_value < alpha)
         
         return result
     
     except Exception as e:
         raise ValueError(f"Error performing chi-square test: {str(e)}")
 
-def generate_latex_document(observed, expected,chi_squared,dof,alpha, row_labels, col_labels):
+def chi_square_test_batch(observed, alpha=0.05, correction=True, return_expected=False):
+    """
+    Perform chi-square tests of independence on a stack of same-shaped tables at once.
+
+    Parameters:
+    observed: array-like
+        (N, r, c) stack of N contingency tables
+    alpha: float, optional
+        Significance level (default 0.05)
+    correction: bool, optional
+        Apply Yates' continuity correction when there is 1 degree of freedom,
+        like scipy.stats.chi2_contingency (default True)
+    return_expected: bool, optional
+        Also return the (N, r, c) expected frequencies
+
+    Returns:
+    dict: Columnar results; 'chi2_statistic', 'p_value' and 'significant' are arrays
+    of length N. Tables with a zero row or column sum get NaN statistics.
+    """
+    observed = np.asarray(observed, dtype=float)
+    if observed.ndim != 3:
+        raise ValueError(f"Expected an (N, r, c) stack of tables, got shape {observed.shape}")
+    n_tables, n_rows, n_cols = observed.shape
+    dof = (n_rows - 1) * (n_cols - 1)
+
+    row_sums = observed.sum(axis=2, keepdims=True)
+    col_sums = observed.sum(axis=1, keepdims=True)
+    total = row_sums.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = row_sums * col_sums / total
+        if dof == 0:
+            chi2_stat = np.zeros(n_tables)
+        else:
+            diff = observed - expected
+            if correction and dof == 1:
+                # Yates' correction: move every observed count up to 0.5 towards its expectation
+                diff = np.sign(diff) * np.maximum(np.abs(diff) - 0.5, 0)
+            chi2_stat = np.sum(diff ** 2 / expected, axis=(1, 2))
+        chi2_stat[~np.all(expected > 0, axis=(1, 2))] = np.nan
+    from scipy.stats import chi2
+    p_value = chi2.sf(chi2_stat, dof) if dof > 0 else np.ones(n_tables)
+
+    result = {
+        'test_type': "independence",
+        'chi2_statistic': chi2_stat,
+        'p_value': p_value,
+        'degrees_of_freedom': dof,
+        'significant': p_value < alpha,
+        'alpha': alpha
+    }
+    if return_expected:
+        result['expected'] = expected
+    return result
+
+def chi_square_gof_batch(observed, expected=None, alpha=0.05):
+    """
+    Perform chi-square goodness of fit tests on many frequency vectors at once.
+
+    Parameters:
+    observed: array-like
+        (N, k) observed frequencies
+    expected: array-like, optional
+        (k,) or (N, k) expected frequencies; uniform when omitted
+    alpha: float, optional
+        Significance level (default 0.05)
+
+    Returns:
+    dict: Columnar results; 'chi2_statistic', 'p_value' and 'significant' are arrays
+    of length N
     """
-    Generate a LaTeX document containing tables for observed and expected frequencies.
+    observed = np.asarray(observed, dtype=float)
+    if observed.ndim != 2:
+        raise ValueError(f"Expected an (N, k) array of frequencies, got shape {observed.shape}")
+    totals = observed.sum(axis=1, keepdims=True)
+    if expected is None:
+        expected = np.broadcast_to(totals / observed.shape[1], observed.shape)
+    else:
+        expected = np.broadcast_to(np.asarray(expected, dtype=float), observed.shape)
+        if not np.allclose(expected.sum(axis=1, keepdims=True), totals, rtol=1e-8):
+            raise ValueError("For each row the sum of the expected frequencies must match the sum of the observed frequencies")
+    dof = observed.shape[1] - 1
+    chi2_stat = np.sum((observed - expected) ** 2 / expected, axis=1)
+    from scipy.stats import chi2
+    p_value = chi2.sf(chi2_stat, dof)
+    return {
+        'test_type': "goodness of fit",
+        'chi2_statistic': chi2_stat,
+        'p_value': p_value,
+        'degrees_of_freedom': dof,
+        'significant': p_value < alpha,
+        'alpha': alpha
+    }
+
+def build_document(observed, expected,chi_squared,dof,alpha, row_labels, col_labels, fast=True,
+                   simulated_p_value=None, simulations=None):
+    """
+    Build the LaTeX document containing tables for observed and expected frequencies.
     
     Parameters:
     observed: np.array
         Observed frequencies table
-    expected: np.array
-        Expected frequencies table
+    expected: np.array or None
+        Expected frequencies table, computed from the marginals when None
     row_labels: list of str
         Labels for the rows
     col_labels: list of str
         Labels for the columns
+    fast: bool, optional
+        Emit the LaTeX with latex_emit's string builder instead of pylatex
+        objects; the output is identical (default True)
+    simulated_p_value, simulations: optional
+        Monte Carlo p-value from chi_square_test(..., simulations=...) and the
+        number of random tables behind it, stated after the critical value
     """
-    doc = Document()
+    from scipy.stats import chi2
+    if expected is None:
+        expected = expected_frequencies(observed)
+    Doc, Table, NoEscape = emitter(fast)
+    doc = Doc()
     doc.packages.append(NoEscape(r'\usepackage{graphicx}'))  # Required for resizebox
     doc.packages.append(NoEscape(r'\usepackage{amsmath}'))
     
@@ -82,7 +393,7 @@ def generate_latex_document(observed, expected,chi_squared,dof,alpha, row_labels
     # Observed Frequencies Table
     doc.append(NoEscape(r'\textbf{\huge Tablica pravih vrijednosti\\}'))
     doc.append(NoEscape(r'\resizebox{0.4\textwidth}{!}{%'))  # Resize to 75% of text width
-    with doc.create(Tabular('|c|' + 'c' * observed.shape[1] + '|c|')) as table:
+    with doc.create(Table('|c|' + 'c' * observed.shape[1] + '|c|')) as table:
         # Column labels
         table.add_hline()
         table.add_row([''] + col_labels + [NoEscape(r'$\Sigma$')])
@@ -105,7 +416,7 @@ def generate_latex_document(observed, expected,chi_squared,dof,alpha, row_labels
     doc.append(NoEscape(r'\textbf{\huge Tablica očekivanih vrijednosti}\\'))
     doc.append(NoEscape(r'\resizebox{0.4\textwidth}{!}{%'))  # Resize to 75% of text width
     table_data = expected.round(2).astype(str).tolist()
-    with doc.create(Tabular('|c|' + 'c' * expected.shape[1] + '|')) as table:
+    with doc.create(Table('|c|' + 'c' * expected.shape[1] + '|')) as table:
         table.add_hline()
         table.add_row([''] + col_labels)
         table.add_hline()
@@ -126,23 +437,19 @@ def generate_latex_document(observed, expected,chi_squared,dof,alpha, row_labels
     doc.append(NoEscape(r'\begin{equation*}'))
     doc.append(NoEscape(r'\begin{aligned}'))
     doc.append(NoEscape('&='))
-    line_length = 0  # Keep track of terms per line
-
-    for i, (o, e) in enumerate(zip(observed.flatten(), expected.flatten().round(2))):
-        # Append the fraction
-        fraction = r' \frac{(' + str(o) + ' - ' + str(e) + ')^2}{' + str(e) + '}'
-
-        # Check if it's the last element to avoid trailing '+'
-        if i != len(observed.flatten()) - 1:
+    observed_cells = observed.flatten().tolist()
+    expected_cells = expected.flatten().round(2).tolist()
+    fractions = [r' \frac{(' + str(o) + ' - ' + str(e) + ')^2}{' + str(e) + '}'
+                 for o, e in zip(observed_cells, expected_cells)]
+    last = len(fractions) - 1
+    for i, fraction in enumerate(fractions):
+        # Avoid a trailing '+' after the last term
+        if i != last:
             fraction += ' +'
-
         # Add a line break after 3 terms
-        if line_length >= 2:
-            doc.append(NoEscape(fraction + r' \\&'))
-            line_length = 0
-        else:
-            doc.append(NoEscape(fraction))
-            line_length += 1       
+        if i % 3 == 2:
+            fraction += r' \\&'
+        doc.append(NoEscape(fraction))
     doc.append(NoEscape(r'=' + str(chi_squared)))
     doc.append(NoEscape(r'\end{aligned}'))
     doc.append(NoEscape(r'\end{equation*}'))
@@ -166,27 +473,50 @@ def generate_latex_document(observed, expected,chi_squared,dof,alpha, row_labels
         doc.append(NoEscape(r'\Large Jer je $\chi^2=$%s > %s, odbacujemo nul hipotezu o jednakosti distribucija na razini značajnosti $\alpha$=%s.'%(chi_squared,critical_value,alpha)))
     else:
         doc.append(NoEscape(r'\Large Jer je $\chi^2=$%s < %s, ne možemo odbaciti nul hipotezu o jednakosti distribucija.'%(chi_squared,critical_value)))
-    doc.generate_pdf('chi_square', clean_tex=False)
-    image = convert_from_path('chi_square.pdf')
-    image[0].save('chi_square.png','PNG')
+    if simulated_p_value is not None:
+        doc.append(NoEscape(r'\\'))
+        doc.append(NoEscape(r'\Large Simulirana p-vrijednost (%s slučajnih tablica s istim marginalnim sumama) je $p$ = %s.' % (simulations, round(simulated_p_value, 4))))
+        doc.append(NoEscape(r'\\'))
+        if simulated_p_value < alpha:
+            doc.append(NoEscape(r'\Large Jer je $p$ < %s, odbacujemo nul hipotezu na razini značajnosti $\alpha$=%s.' % (alpha, alpha)))
+        else:
+            doc.append(NoEscape(r'\Large Jer je $p \geq$ %s, prema simulaciji ne možemo odbaciti nul hipotezu.' % (alpha)))
+    return doc
+
+def generate_latex_document(observed, expected,chi_squared,dof,alpha, row_labels, col_labels, filename='chi_square',
+                            simulated_p_value=None, simulations=None, **render_options):
+    """
+    Generate the chi-square report and render it to '<filename>.pdf' and '<filename>.png'.
+    Extra keyword arguments (cache, dpi, fmt, pages, ...) are passed to render.render_document.
+    """
+    with span('report', report='chi_square', size=int(np.size(observed))):
+        with span('build'):
+            doc = build_document(observed, expected, chi_squared, dof, alpha, row_labels, col_labels,
+                                 simulated_p_value=simulated_p_value, simulations=simulations)
+        return render_document(doc, filename, **render_options)
 
 # Example usage
 if __name__ == "__main__":
-    # Example for homogeneity test
-    population_data = []
-    print("Enter data for each population row (space-separated numbers):")
-    print("Enter blank line when done")
-    while True:
-        row = input().strip()
-        if not row:
-            break
-        population_data.append([int(x.strip()) for x in row.split()])
-    
-    population_data = np.array(population_data)
+    import sys
+    from loaders import load_contingency_table
+
+    # Example for homogeneity test; the table can also be given as a file (.csv, .txt, .npy, ...)
+    if len(sys.argv) > 1:
+        population_data = load_contingency_table(sys.argv[1])
+    else:
+        rows = []
+        print("Enter data for each population row (space-separated numbers):")
+        print("Enter blank line when done")
+        while True:
+            row = input().strip()
+            if not row:
+                break
+            rows.append(np.array(row.split(), dtype=np.int64))
+        population_data = np.vstack(rows)
 
     # Perform the test and generate LaTeX document
-    chi2_stat, p_value, dof, expected = chi2_contingency(population_data)
     result = chi_square_test(population_data)
+    chi2_stat, dof, expected = result['chi2_statistic'], result['degrees_of_freedom'], result['expected']
     print("hi-kvadrat:",chi2_stat)
     print("\nObserved Frequencies:")
     print(np.array(population_data))
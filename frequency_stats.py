@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+
+def merge_frequency_tables(*tables):
+    """
+    Merge (values, frequencies) tables into one table with sorted distinct values.
+
+    Parameters:
+    tables: tuple of (array-like, array-like)
+        Partial frequency tables, e.g. one per chunk of a large input
+
+    Returns:
+    tuple: (values, frequencies) with values sorted ascending and unique
+    """
+    values = np.concatenate([np.asarray(v, dtype=float).ravel() for v, _ in tables])
+    frequencies = np.concatenate([np.asarray(f, dtype=np.int64).ravel() for _, f in tables])
+    if np.any(frequencies < 0):
+        raise ValueError("Frequencies must be non-negative")
+    distinct, inverse = np.unique(values, return_inverse=True)
+    merged = np.bincount(inverse, weights=frequencies, minlength=len(distinct))
+    return distinct, merged.astype(np.int64)
+
+def frequency_table_from_chunks(chunks):
+    """
+    Fold an iterable of (values, frequencies) chunks into one frequency table.
+
+    Only the running table of distinct values is kept, so memory is O(distinct
+    values) no matter how many chunks are streamed in.
+    """
+    table = (np.empty(0), np.empty(0, dtype=np.int64))
+    for chunk in chunks:
+        table = merge_frequency_tables(table, chunk)
+    return table
+
+def binned_frequency_table(values, frequencies, bins):
+    """
+    Group a frequency table into `bins` equal-width classes spanning its values.
+
+    Returns:
+    tuple: (edges, frequencies), bins + 1 class edges and the total frequency of
+    every class; classes are [edges[i], edges[i+1]>, the last one closed
+    """
+    counts, edges = np.histogram(np.asarray(values, dtype=float), bins=bins,
+                                 weights=np.asarray(frequencies, dtype=np.int64))
+    return edges, counts.astype(np.int64)
+
+def _sorted_quantile(values, frequencies, q):
+    cumulative = np.cumsum(frequencies)
+    position = (cumulative[-1] - 1) * np.asarray(q, dtype=float)
+    lower = np.floor(position)
+    # The 0-based observation i lies in the first bin whose cumulative count exceeds i
+    lower_value = values[np.searchsorted(cumulative, lower, side='right')]
+    upper_value = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+    return lower_value + (upper_value - lower_value) * (position - lower)
+
+def weighted_quantile(values, frequencies, q):
+    """
+    Quantile(s) of the data described by a frequency table.
+
+    Matches np.quantile(np.repeat(values, frequencies), q) with linear
+    interpolation, without expanding the table.
+    """
+    values, frequencies = merge_frequency_tables((values, frequencies))
+    if frequencies.sum() == 0:
+        raise ValueError("Cannot compute quantiles of an empty frequency table")
+    return _sorted_quantile(values, frequencies, q)
+
+def frequency_statistics(values, frequencies):
+    """
+    Summary statistics of a frequency table without expanding it with np.repeat.
+
+    Parameters:
+    values: array-like
+        Distinct (or repeated) observed values
+    frequencies: array-like
+        Number of occurrences of each value
+
+    Returns:
+    dict: n, mean, variance (population, ddof=0), std_dev and median
+    """
+    values, frequencies = merge_frequency_tables((values, frequencies))
+    n = int(frequencies.sum())
+    if n == 0:
+        raise ValueError("Cannot compute statistics of an empty frequency table")
+    mean = np.dot(frequencies, values) / n
+    # Second pass over the distinct values only, which is more stable than E[x^2] - E[x]^2
+    variance = np.dot(frequencies, (values - mean) ** 2) / n
+    return {
+        'n': n,
+        'mean': mean,
+        'variance': variance,
+        'std_dev': math.sqrt(variance),
+        'median': _sorted_quantile(values, frequencies, 0.5)
+    }
@@ -0,0 +1,153 @@
+"""
+Structured timing spans for the report pipeline.
+
+Code wraps each phase in `with span('compile', ...) as s:`; when the phase ends a
+record with its name, duration and fields (input size, output bytes, cache hit,
+...) is passed to every registered sink. A sink is any callable taking the
+record dict, e.g. JsonLinesSink, LoggingSink or a plain callback:
+
+    instrument.add_sink(instrument.JsonLinesSink('spans.jsonl'))
+
+Without sinks span() returns a shared no-op object, so instrumentation costs one
+function call per phase. A no-op span is falsy, so work done only to fill in
+fields (file sizes, ...) can be skipped with `if s:`. Setting the ZADAR_SPANS
+environment variable to a file name adds a JsonLinesSink for it at import,
+which also covers worker processes.
+"""
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+_sinks = []
+_current = contextvars.ContextVar('zadar_span', default=None)
+_ids = itertools.count(1)
+_logger = logging.getLogger(__name__)
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def set(self, **fields):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+class Span:
+    """
+    A running phase. Nested spans record the id of the enclosing one as 'parent'
+    and inherit its 'report' field.
+    """
+    __slots__ = ('fields', 'start', 'token')
+
+    def __init__(self, phase, fields):
+        parent = _current.get()
+        self.fields = {'phase': phase, 'id': next(_ids), 'parent': None, 'pid': os.getpid()}
+        if parent is not None:
+            self.fields['parent'] = parent.fields['id']
+            if 'report' in parent.fields:
+                self.fields['report'] = parent.fields['report']
+        self.fields.update(fields)
+
+    def set(self, **fields):
+        """
+        Add fields to the record, e.g. sizes only known once the phase is done.
+        """
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.token = _current.set(self)
+        self.fields['timestamp'] = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fields['duration'] = time.perf_counter() - self.start
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        emit(self.fields)
+        return False
+
+def span(phase, **fields):
+    """
+    Context manager timing one phase; a no-op unless a sink is registered.
+    """
+    if not _sinks:
+        return _NO_SPAN
+    return Span(phase, fields)
+
+def enabled():
+    return bool(_sinks)
+
+def emit(record):
+    """
+    Pass a finished record to every sink. A failing sink is logged, never raised,
+    so instrumentation cannot break a report.
+    """
+    for sink in list(_sinks):
+        try:
+            sink(record)
+        except Exception:
+            _logger.exception("Span sink %r failed", sink)
+
+def add_sink(sink):
+    _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+def _json_default(value):
+    # NumPy scalars and arrays
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+class JsonLinesSink:
+    """
+    Append every span as one JSON line to `path`. Lines are written whole and
+    flushed right away, so several processes may share one file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def __call__(self, record):
+        line = json.dumps(record, default=_json_default) + '\n'
+        with self.lock:
+            self.file.write(line)
+
+    def close(self):
+        self.file.close()
+
+class LoggingSink:
+    """
+    Log every span as JSON through `logger`; the record itself is attached to the
+    log record as its `span` attribute for structured handlers.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger('zadar.spans')
+        self.level = level
+
+    def __call__(self, record):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "span %s", json.dumps(record, default=_json_default),
+                            extra={'span': record})
+
+if os.environ.get('ZADAR_SPANS'):
+    add_sink(JsonLinesSink(os.environ['ZADAR_SPANS']))
@@ -0,0 +1,154 @@
+# Same replacements as pylatex.utils.escape_latex
+_ESCAPES = str.maketrans({
+    '&': r'\&', '%': r'\%', '$': r'\$', '#': r'\#', '_': r'\_', '{': r'\{', '}': r'\}',
+    '~': r'\textasciitilde{}', '^': r'\^{}', '\\': r'\textbackslash{}',
+    '\n': '\\newline%\n', '-': '{-}', '\xa0': '~', '[': '{[}', ']': '{]}'
+})
+
+# The preamble pylatex.Document() starts with
+DEFAULT_PACKAGES = [
+    r'\usepackage[T1]{fontenc}',
+    r'\usepackage[utf8]{inputenc}',
+    r'\usepackage{lmodern}',
+    r'\usepackage{textcomp}',
+    r'\usepackage{lastpage}',
+]
+
+# How the data tables of the regression and median reports are laid out:
+#   full    every row in one tabular scaled to the page, as in the original worksheets
+#   long    a longtable broken across pages with its header repeated; above max_rows
+#           only the first and last rows are listed, the rest summed in one row
+#   binned  at most max_rows rows, each summarizing a range of the data
+TABLE_LAYOUTS = ('full', 'long', 'binned')
+
+# Largest table the default layout still prints in full
+MAX_TABLE_ROWS = 50
+
+class NoEscape(str):
+    """
+    LaTeX that is emitted as is, like pylatex.NoEscape, without importing pylatex.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({str(self)!r})'
+
+def emitter(fast=True):
+    """
+    The (Document, Tabular, NoEscape) classes a report is built from: the string
+    builders of this module, or with fast=False pylatex's, which is only imported then.
+    """
+    if fast:
+        return TexDocument, TexTabular, NoEscape
+    from pylatex import Document, Tabular, NoEscape as PylatexNoEscape
+    return Document, Tabular, PylatexNoEscape
+
+def long_table(fast=True):
+    """
+    The longtable class to use with emitter(fast).
+    """
+    if fast:
+        return TexLongTable
+    from pylatex import LongTable
+    return LongTable
+
+def table_layout(layout, rows, max_rows=MAX_TABLE_ROWS):
+    """
+    Resolve the layout of a data table with `rows` rows; None picks 'full' for
+    tables of up to max_rows rows and 'long' for larger ones.
+    """
+    if max_rows < 2:
+        raise ValueError("max_rows must be at least 2")
+    if layout is None:
+        return 'full' if rows <= max_rows else 'long'
+    if layout not in TABLE_LAYOUTS:
+        raise ValueError(f"Unknown table layout {layout!r}, expected one of {TABLE_LAYOUTS}")
+    return layout
+
+def escape(item):
+    """
+    Convert a table cell to LaTeX like pylatex does, escaping anything but NoEscape.
+    """
+    if isinstance(item, NoEscape):
+        return item
+    return str(item).translate(_ESCAPES)
+
+class TexTabular:
+    """
+    String-building stand-in for pylatex.Tabular: rows are joined directly into
+    LaTeX lines instead of being kept as pylatex objects.
+    """
+
+    def __init__(self, table_spec):
+        self.table_spec = table_spec
+        self.lines = []
+
+    def add_hline(self):
+        self.lines.append(r'\hline')
+
+    def add_row(self, cells):
+        self.lines.append('&'.join(map(escape, cells)) + '\\\\')
+
+    def add_rows(self, rows):
+        """
+        Add many rows of cells at once.
+        """
+        self.lines.extend('&'.join(map(escape, cells)) + '\\\\' for cells in rows)
+
+    def dumps(self):
+        return '%\n'.join([r'\begin{tabular}{' + self.table_spec + '}'] + self.lines + [r'\end{tabular}'])
+
+class TexLongTable(TexTabular):
+    """
+    String-building stand-in for pylatex.LongTable.
+    """
+    packages = [r'\usepackage{longtable}']
+
+    def end_table_header(self):
+        """
+        End the header repeated at the top of every page.
+        """
+        self.lines.append(r'\endhead')
+
+    def dumps(self):
+        return '%\n'.join([r'\begin{longtable}{' + self.table_spec + '}'] + self.lines + [r'\end{longtable}'])
+
+class _Created:
+    def __init__(self, doc, item):
+        self.doc = doc
+        self.item = item
+
+    def __enter__(self):
+        return self.item
+
+    def __exit__(self, *exc):
+        # Like pylatex, an environment brings the packages it needs
+        self.doc.packages.extend(getattr(self.item, 'packages', ()))
+        self.doc.append(self.item.dumps())
+
+class TexDocument:
+    """
+    String-building stand-in for pylatex.Document producing byte-identical output.
+
+    Supports the subset of the pylatex API the reports use: packages.append,
+    append(NoEscape(...)), create(TexTabular(...)) and dumps().
+    """
+
+    def __init__(self, font_size='normalsize'):
+        self.packages = list(DEFAULT_PACKAGES)
+        self.body = ['\\' + font_size]
+
+    def append(self, item):
+        self.body.append(item)
+
+    def extend(self, items):
+        self.body.extend(items)
+
+    def create(self, item):
+        return _Created(self, item)
+
+    def dumps(self):
+        # pylatex keeps packages in an ordered set, so duplicates are dropped
+        packages = list(dict.fromkeys(self.packages))
+        return ('\\documentclass{article}%\n' + '%\n'.join(packages) + '%\n%\n%\n%\n'
+                + '\\begin{document}%\n' + '%\n'.join(self.body) + '%\n\\end{document}')
@@ -0,0 +1,86 @@
+import functools
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+BEGIN_DOCUMENT = r'\begin{document}'
+
+def split_preamble(tex):
+    """
+    Split a LaTeX source into its preamble and the part starting at \\begin{document}.
+    """
+    idx = tex.index(BEGIN_DOCUMENT)
+    return tex[:idx], tex[idx:]
+
+@functools.lru_cache(maxsize=None)
+def engine_version(compiler='pdflatex'):
+    """
+    First line of `compiler --version`, e.g. 'pdfTeX 3.141592653-2.6-1.40.25 (TeX Live 2023)'.
+    """
+    output = subprocess.check_output([compiler, '--version'], stderr=subprocess.STDOUT)
+    return output.decode('utf-8', 'replace').splitlines()[0]
+
+def ensure_format(preamble, format_dir, compiler='pdflatex'):
+    """
+    Build (once) a format file with the preamble already loaded.
+
+    Formats are named after a hash of the preamble, so every distinct package set
+    (e.g. the extra 'enumerate' of the normal distribution report) gets its own
+    format and later calls reuse it. The engine version is part of the hash, since
+    a format file can only be loaded by the binary that dumped it.
+
+    Returns:
+    str: The format name, to be passed as '-fmt=<name>' with TEXFORMATS pointing
+    at `format_dir`
+    """
+    key = '\n'.join((compiler, engine_version(compiler), preamble))
+    name = 'zadar-' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+    if os.path.exists(os.path.join(format_dir, name + '.fmt')):
+        return name
+
+    os.makedirs(format_dir, exist_ok=True)
+    # Every build gets its own directory, so concurrent builds of the same format
+    # (from other threads or processes) never share files; the finished format is
+    # moved into place atomically and the last one to finish wins
+    build_dir = tempfile.mkdtemp(prefix=name + '-', dir=format_dir)
+    try:
+        with open(os.path.join(build_dir, name + '.tex'), 'w', encoding='utf-8') as f:
+            f.write(preamble + '\n\\dump\n')
+        subprocess.check_output(
+            [compiler, '-ini', '-interaction=nonstopmode', f'-jobname={name}', f'&{compiler}', name + '.tex'],
+            stderr=subprocess.STDOUT, cwd=build_dir
+        )
+        os.replace(os.path.join(build_dir, name + '.fmt'), os.path.join(format_dir, name + '.fmt'))
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return name
+
+def compile_with_format(tex, filename, format_dir, compiler='pdflatex'):
+    """
+    Compile `tex` into '<filename>.pdf' against a precompiled preamble format.
+
+    The full source is still written to '<filename>.tex'; only the document body
+    is handed to the compiler, the preamble comes from the format.
+    """
+    preamble, body = split_preamble(tex)
+    format_dir = os.path.abspath(format_dir)
+    name = ensure_format(preamble, format_dir, compiler)
+
+    filename = os.path.abspath(filename)
+    dest_dir, jobname = os.path.split(filename)
+    with open(filename + '.tex', 'w', encoding='utf-8') as f:
+        f.write(tex)
+    body_file = filename + '-body.tex'
+    with open(body_file, 'w', encoding='utf-8') as f:
+        f.write(body)
+
+    env = dict(os.environ, TEXFORMATS=format_dir + os.pathsep)
+    try:
+        subprocess.check_output(
+            [compiler, f'-fmt={name}', '-interaction=nonstopmode', f'-jobname={jobname}', body_file],
+            stderr=subprocess.STDOUT, cwd=dest_dir, env=env
+        )
+    finally:
+        os.remove(body_file)
@@ -1,31 +1,41 @@
+import sys
+
 import numpy as np
-from scipy.stats import linregress
+from regression_stats import regression_moments, moments_from_csv, regression_summary
 
 # Sample data points
 x = np.array([6,6,8,8,8,9])  # Replace x1, x2, ..., xn with your x values
 y = np.array([0.6, 1.1, 2.4,2.5,3,3.5])  # Replace y1, y2, ..., yn with your y values
 
+# A CSV file with x and y columns can be given instead; it is read in chunks, so it may be larger than RAM
+if len(sys.argv) > 1:
+    moments = moments_from_csv(sys.argv[1])
+else:
+    moments = regression_moments(x, y)
+population = regression_summary(moments, ddof=0)
+sample = regression_summary(moments, ddof=1)  # Use ddof=1 for sample variance
+
 # Calculate averages
-mean_x = np.mean(x)
-mean_y = np.mean(y)
+mean_x = population['mean_x']
+mean_y = population['mean_y']
 print(mean_x)
 # Calculate variances
-variance_x = np.var(x, ddof=0)  # Use ddof=1 for sample variance
+variance_x = population['var_x']
 print(variance_x)
-variance_y = np.var(y, ddof=1)
+variance_y = sample['var_y']
 
 # Calculate covariance
-covariance_xy = np.cov(x, y, ddof=1)[0, 1]  # Use ddof=1 for sample covariance
+covariance_xy = sample['covariance']  # Use ddof=1 for sample covariance
 
 # Calculate correlation coefficient
-correlation_coefficient = np.corrcoef(x, y)[0, 1]
+correlation_coefficient = population['correlation']
 
 # Perform linear regression
-slope, intercept, r_value, p_value, std_err = linregress(x, y)
+slope, intercept = population['slope'], population['intercept']
 # Output results
 print(f"Averages: Mean_x = {mean_x}, Mean_y = {mean_y}")
 print(f"Variances: Variance_x = {variance_x}, Variance_y = {variance_y}")
 print(f"Covariance: Cov(x, y) = {covariance_xy}")
 print(f"Correlation Coefficient: Corr(x, y) = {correlation_coefficient}")
 print(f"Regression Coefficient: Cov(x,y)/var(x) = {slope}")
-print(f"Linear Regression Line: y = {slope}x + {intercept}")
\ No newline at end of file
+print(f"Linear Regression Line: y = {slope}x + {intercept}")
@@ -1,64 +1,136 @@
 import numpy as np
-from scipy.stats import linregress
-from pylatex import Document, Tabular, NoEscape
-from pdf2image import convert_from_path
+from instrument import span
+from render import render_document
+from latex_emit import MAX_TABLE_ROWS, emitter, long_table, table_layout
+from regression_stats import regression_moments, regression_summary
 
 def correct(x):
     if x.is_integer():
         return int(x)
     return x
-def generate_latex_document(x_values, y_values):
-    doc = Document()
+def summary_rows(columns, layout, max_rows):
+    """
+    Rows of the worksheet table for the long and binned layouts, at most max_rows.
+
+    Parameters:
+    columns: list of np.ndarray
+        The per-point table columns (x, y, deviations, products, squares)
+    layout: str
+        'long' keeps the first and last points and sums the ones between them
+        in one row; 'binned' sums consecutive blocks of points
+
+    Returns:
+    list of tuple: (first, last, values) per row, the 1-based range of points it
+    covers and the column sums over them (a point's own values when first == last)
+    """
+    n = len(columns[0])
+    if layout == 'binned':
+        starts = np.unique(np.linspace(0, n, min(max_rows, n) + 1).astype(int))
+    elif n <= max_rows:
+        starts = np.arange(n + 1)
+    else:
+        head = (max_rows - 1) // 2
+        tail = max_rows - 1 - head
+        starts = np.concatenate([np.arange(head + 1), np.arange(n - tail, n + 1)])
+    # Sums over the blocks in one vectorized pass; a block of one point is the point itself
+    sums = [np.round(np.add.reduceat(column, starts[:-1]), 4).tolist() for column in columns]
+    return [(start + 1, stop, [column[idx] for column in sums])
+            for idx, (start, stop) in enumerate(zip(starts[:-1].tolist(), starts[1:].tolist()))]
+
+def build_document(x_values, y_values, fast=True, layout=None, max_rows=MAX_TABLE_ROWS):
+    """
+    Build the regression report; with fast (the default) the LaTeX is emitted
+    by latex_emit's string builder instead of pylatex objects, with identical output.
+
+    layout selects how the per-point table is printed (see latex_emit.TABLE_LAYOUTS);
+    by default up to max_rows points are listed in full and larger inputs get a
+    long table of bounded size. The statistics always cover every point.
+    """
+    Doc, Table, NoEscape = emitter(fast)
+    doc = Doc()
     
     doc.packages.append(NoEscape(r'\usepackage{graphicx}'))  # Required for resizebox
     doc.packages.append(NoEscape(r'\usepackage{amsmath}'))
     
     doc.append(NoEscape(r'\renewcommand{\arraystretch}{2}'))
     
-    x_mean = round(np.mean(x_values),4)
-    y_mean = round(np.mean(y_values),4)
-    x_var = round(np.var(x_values),4)
-    y_var = round(np.var(y_values),4)
-    corr_coef = round(np.corrcoef(x_values, y_values)[0, 1],4)
-    reg_coef = round(round((np.sum((x_values-x_mean)*(y_values-y_mean)))/len(y_values),4)/x_var,4)
-    doc.append(NoEscape(r'\resizebox{1.2\textwidth}{!}{%'))  # Resize to 75% of text width
-    with doc.create(Tabular('c|' + 'c|' * 7 )) as table:
-        # Column labels
-        table.add_hline()
-        table.add_row([NoEscape(r'i'),NoEscape(r'$x_i$'),NoEscape(r'$y_i$'),
-                       NoEscape(r'$x_i-\overline{x}$'),NoEscape(r'$y_i-\overline{y}$'),
-                       NoEscape(r'$(x_i-\overline{x})(y_i-\overline{y})$'),
-                       NoEscape(r'$(x_i-\overline{x})^2$'),NoEscape(r'$(y_i-\overline{y})^2$')])
-        table.add_hline()
+    moments = regression_moments(x_values, y_values)
+    summary = regression_summary(moments)
+    n = moments['n']
+    x_sum = round(moments['sum_x'],4)
+    y_sum = round(moments['sum_y'],4)
+    x_mean = round(summary['mean_x'],4)
+    y_mean = round(summary['mean_y'],4)
+    x_var = round(summary['var_x'],4)
+    y_var = round(summary['var_y'],4)
+    corr_coef = round(summary['correlation'],4)
+    # The worksheet takes deviations from the rounded means, one row per data point
+    dx = x_values - x_mean
+    dy = y_values - y_mean
+    dxy = dx*dy
+    sum_xy = round(np.sum(dxy),4)
+    sum_xx = round(np.sum(dx**2),4)
+    sum_yy = round(np.sum(dy**2),4)
+    cov = round(np.sum(dxy)/n,4)
+    reg_coef = round(cov/x_var,4)
+    header = [NoEscape(r'i'),NoEscape(r'$x_i$'),NoEscape(r'$y_i$'),
+              NoEscape(r'$x_i-\overline{x}$'),NoEscape(r'$y_i-\overline{y}$'),
+              NoEscape(r'$(x_i-\overline{x})(y_i-\overline{y})$'),
+              NoEscape(r'$(x_i-\overline{x})^2$'),NoEscape(r'$(y_i-\overline{y})^2$')]
+    totals = [NoEscape(r'$\Sigma$')] + [x_sum,y_sum,0,0,sum_xy,sum_xx,sum_yy]
+    layout = table_layout(layout, n, max_rows)
+    if layout == 'full':
+        doc.append(NoEscape(r'\resizebox{1.2\textwidth}{!}{%'))  # Resize to 75% of text width
+        with doc.create(Table('c|' + 'c|' * 7 )) as table:
+            # Column labels
+            table.add_hline()
+            table.add_row(header)
+            table.add_hline()
 
-        # Table data with row sums
-        for idx, (x, y) in enumerate(zip(x_values,y_values)):
-            table.add_row([idx+1,x,y,round(x-x_mean,4),round(y-y_mean,4),round((x-x_mean)*(y-y_mean),4),round((x-x_mean)**2,4),round((y-y_mean)**2,4)])
-        table.add_hline()
+            # Table data with row sums
+            columns = [x_values, y_values, np.round(dx,4), np.round(dy,4), np.round(dxy,4), np.round(dx**2,4), np.round(dy**2,4)]
+            for idx, row in enumerate(zip(*[column.tolist() for column in columns])):
+                table.add_row((idx+1,) + row)
+            table.add_hline()
 
-        # Column sums and Sigma symbol
-        table.add_row([NoEscape(r'$\Sigma$')] + [round(np.sum(x_values),4),round(np.sum(y_values),4),
-                                                 0,
-                                                 0,
-                                                 round(np.sum((x_values-x_mean)*(y_values-y_mean)),4),
-                                                 round(np.sum((x_values-x_mean)**2),4),
-                                                 round(np.sum((y_values-y_mean)**2),4)])
-        table.add_hline()
-    doc.append(NoEscape(r'}\\'))  # Close resizebox
+            # Column sums and Sigma symbol
+            table.add_row(totals)
+            table.add_hline()
+        doc.append(NoEscape(r'}\\'))  # Close resizebox
+    else:
+        # A longtable cannot be scaled, so it is set in a smaller font and breaks across pages instead
+        rows = summary_rows([x_values, y_values, dx, dy, dxy, dx**2, dy**2], layout, max_rows)
+        doc.append(NoEscape(r'\begingroup\footnotesize\setlength{\tabcolsep}{3pt}'))
+        with doc.create(long_table(fast)('c|' + 'c|' * 7)) as table:
+            table.add_hline()
+            table.add_row(header)
+            table.add_hline()
+            table.end_table_header()
+            for first, last, row in rows:
+                label = first if first == last else NoEscape(r'$\Sigma_{%d}^{%d}$' % (first, last))
+                table.add_row([label] + row)
+            table.add_hline()
+            table.add_row(totals)
+            table.add_hline()
+        doc.append(NoEscape(r'\endgroup'))
+        note = r'Broj podataka: $n=%s$.' % n
+        if len(rows) < n:
+            note += r' Redak $\Sigma_{a}^{b}$ sadrži zbrojeve stupaca za podatke od $a$ do $b$.'
+        doc.append(NoEscape(note + r'\\'))
     doc.append(NoEscape(r'\\[1em]'))
-    doc.append(NoEscape(r'\Large $\overline{x}=\frac{%s}{%s}=%s$' % (round(np.sum(x_values),4),len(x_values),x_mean)))
+    doc.append(NoEscape(r'\Large $\overline{x}=\frac{%s}{%s}=%s$' % (x_sum,n,x_mean)))
     doc.append(NoEscape(r'\\[1em]'))
-    doc.append(NoEscape(r'\Large $\overline{y}=\frac{%s}{%s}=%s$' % (round(np.sum(y_values),4),len(y_values),y_mean)))
+    doc.append(NoEscape(r'\Large $\overline{y}=\frac{%s}{%s}=%s$' % (y_sum,n,y_mean)))
     doc.append(NoEscape(r'\\[1em]'))
-    doc.append(NoEscape(r'\Large $Cov(x,y)=\frac{1}{n}\Sigma(x_i-\overline{x})(y_i-\overline{y})=\frac{%s}{%s}=%s$' % (round(np.sum((x_values-x_mean)*(y_values-y_mean)),4),len(y_values),round((np.sum((x_values-x_mean)*(y_values-y_mean)))/len(y_values),4))))
+    doc.append(NoEscape(r'\Large $Cov(x,y)=\frac{1}{n}\Sigma(x_i-\overline{x})(y_i-\overline{y})=\frac{%s}{%s}=%s$' % (sum_xy,n,cov)))
     doc.append(NoEscape(r'\\[1em]'))
-    doc.append(NoEscape(r'\Large $Var(x)=\frac{1}{n}\Sigma{(x_i-\overline{x})}^2=\frac{%s}{%s}=%s$' % (round(np.sum((x_values-x_mean)**2),4),len(y_values),x_var)))
+    doc.append(NoEscape(r'\Large $Var(x)=\frac{1}{n}\Sigma{(x_i-\overline{x})}^2=\frac{%s}{%s}=%s$' % (sum_xx,n,x_var)))
     doc.append(NoEscape(r'\\[1em]'))
-    doc.append(NoEscape(r'\Large $Var(y)=\frac{1}{n}\Sigma{(y_i-\overline{y})}^2=\frac{%s}{%s}=%s$' % (round(np.sum((y_values-y_mean)**2),4),len(y_values),y_var)))
+    doc.append(NoEscape(r'\Large $Var(y)=\frac{1}{n}\Sigma{(y_i-\overline{y})}^2=\frac{%s}{%s}=%s$' % (sum_yy,n,y_var)))
     doc.append(NoEscape(r'\\[1em]'))
-    doc.append(NoEscape(r'\Large $Kor(x,y)=\frac{Cov(x,y)}{\sqrt{Var(x)Var(y)}}=\frac{%s}{\sqrt{%s \cdot %s}}=%s$' % (round((np.sum((x_values-x_mean)*(y_values-y_mean)))/len(y_values),4),x_var,y_var,corr_coef)))
+    doc.append(NoEscape(r'\Large $Kor(x,y)=\frac{Cov(x,y)}{\sqrt{Var(x)Var(y)}}=\frac{%s}{\sqrt{%s \cdot %s}}=%s$' % (cov,x_var,y_var,corr_coef)))
     doc.append(NoEscape(r'\\[1em]'))
-    doc.append(NoEscape(r'\Large $koef. regresije=\frac{Cov(x,y)}{Var(x)}=\frac{%s}{%s}=%s$' % (round((np.sum((x_values-x_mean)*(y_values-y_mean)))/len(y_values),4),x_var,reg_coef)))
+    doc.append(NoEscape(r'\Large $koef. regresije=\frac{Cov(x,y)}{Var(x)}=\frac{%s}{%s}=%s$' % (cov,x_var,reg_coef)))
     doc.append(NoEscape(r'\\[1em]'))
     doc.append(NoEscape(r'\Large \text{jednadžba pravca:}\\'))
     doc.append(NoEscape(r'$y-\overline{y}=\frac{Cov(x,y)}{Var(x)}(x-\overline{x})$\\'))
@@ -69,23 +141,30 @@ def generate_latex_document(x_values, y_values):
         doc.append(NoEscape(r'$y=%sx+%s$' %(reg_coef,round(y_mean-reg_coef*x_mean,4))))
     else:
         doc.append(NoEscape(r'$y=%sx%s$' %(reg_coef,round(y_mean-reg_coef*x_mean,4))))
-    doc.generate_pdf('linear_regression', clean_tex=False)
-    image = convert_from_path('linear_regression.pdf')
-    image[0].save('linear_regression.png','PNG')
+    return doc
+
+def generate_latex_document(x_values, y_values, filename='linear_regression', layout=None, max_rows=MAX_TABLE_ROWS,
+                            **render_options):
+    with span('report', report='linear_regression', size=len(x_values)):
+        with span('build'):
+            doc = build_document(x_values, y_values, layout=layout, max_rows=max_rows)
+        return render_document(doc, filename, **render_options)
 
 # Example usage
 if __name__ == "__main__":
-    x_values = []
-    y_values = []
+    import sys
+    from loaders import load_xy
 
-    print("Enter the x values (space-separated numbers):")
-    row = input().strip()
-    x_values.append([float(x.strip()) for x in row.split()])
-    x_values = np.round(np.array(x_values).flatten(),2)
-    print("Enter the y values (space-separated numbers):")
-    row = input().strip()
-    y_values.append([float(x.strip()) for x in row.split()])
-    y_values = np.round(np.array(y_values).flatten(),2)
+    # x and y columns can also be given as a file (.csv, .txt, .npy, ...)
+    if len(sys.argv) > 1:
+        x_values, y_values = load_xy(sys.argv[1])
+    else:
+        print("Enter the x values (space-separated numbers):")
+        x_values = np.array(input().split(), dtype=float)
+        print("Enter the y values (space-separated numbers):")
+        y_values = np.array(input().split(), dtype=float)
+    x_values = np.round(x_values, 2)
+    y_values = np.round(y_values, 2)
 
     generate_latex_document(x_values,y_values)
 
@@ -0,0 +1,123 @@
+"""
+Bulk input loaders feeding the report functions straight from files.
+
+Supported inputs:
+    .csv               comma separated text
+    .txt (or other)    whitespace separated text
+    .npy               NumPy array, memory-mapped instead of read
+    .npz               NumPy archive; the array `key`, or the only one stored
+    .bin / .raw / .dat raw binary of `dtype`, memory-mapped, reshaped to `columns`
+
+Text is parsed by NumPy's C reader into one array, never into Python lists.
+Memory-mapped arrays are only read when their values are used, and the column
+accessors below return views of them, so no copy of the file is made.
+"""
+import os
+
+import numpy as np
+
+RAW_EXTENSIONS = ('.bin', '.raw', '.dat')
+
+def load_array(path, dtype=None, key=None, columns=None):
+    """
+    Load a 2D table of numbers from any supported file.
+
+    Parameters:
+    path: str
+        Input file; its extension selects the format
+    dtype: str or np.dtype, optional
+        Element type: required for raw binary files, the parse type for text
+        (default float). Ignored for .npy/.npz, which store their own
+    key: str, optional
+        Array to take from an .npz archive holding several
+    columns: int, optional
+        Row length of a raw binary file (default 1)
+
+    Returns:
+    np.ndarray or np.memmap: 2D for text and raw files (a single text line is one
+    row); .npy/.npz arrays keep their stored shape
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        array = np.load(path, mmap_mode='r')
+    elif extension == '.npz':
+        with np.load(path) as archive:
+            if key is None:
+                if len(archive.files) != 1:
+                    raise ValueError(f"'{path}' holds {archive.files}; choose one with key=")
+                key = archive.files[0]
+            array = archive[key]
+    elif extension in RAW_EXTENSIONS:
+        if dtype is None:
+            raise ValueError(f"Raw binary file '{path}' needs an explicit dtype")
+        array = np.memmap(path, dtype=dtype, mode='r').reshape(-1, columns or 1)
+    else:
+        array = np.loadtxt(path, dtype=dtype or float, delimiter=',' if extension == '.csv' else None,
+                           ndmin=2, comments='#')
+    return array
+
+def _column_pair(array, first, second, path):
+    if array.ndim == 1:
+        # A flat .npy vector holding the pairs one after the other
+        array = array.reshape(-1, 2)
+    if array.ndim != 2:
+        raise ValueError(f"'{path}' must hold a 2D table, got shape {array.shape}")
+    if max(first, second) >= array.shape[1]:
+        raise ValueError(f"'{path}' has {array.shape[1]} column(s), column {max(first, second)} was requested")
+    return array[:, first], array[:, second]
+
+def _pair_options(options, first, second):
+    # Raw binary files hold at least the two requested columns unless told otherwise
+    options.setdefault('columns', max(first, second) + 1)
+    return options
+
+def _counts(array, path):
+    # Frequencies must be whole numbers; casting would silently truncate 2.7 to 2
+    if np.issubdtype(array.dtype, np.integer):
+        return array
+    if not np.all(np.mod(array, 1) == 0):
+        raise ValueError(f"'{path}' holds frequencies that are not whole numbers")
+    return array.astype(np.int64)
+
+def load_contingency_table(path, **options):
+    """
+    Load an observed frequency table for chi_square.chi_square_test (one table row
+    per file row). Integer .npy/.bin tables stay memory-mapped, which also suits
+    chi_square_test(..., block_size=...) for tables larger than memory. Raw binary
+    tables need `columns`, the number of table columns.
+
+    Returns:
+    np.ndarray or np.memmap: 2D integer table, or 1D frequencies for a
+    goodness of fit test stored as a 1D .npy/.npz array
+    """
+    if os.path.splitext(path)[1].lower() in RAW_EXTENSIONS and options.get('columns') is None:
+        raise ValueError(f"Raw binary table '{path}' needs an explicit number of columns")
+    options.setdefault('dtype', np.int64)
+    table = load_array(path, **options)
+    if table.ndim not in (1, 2):
+        raise ValueError(f"'{path}' must hold a 2D table, got shape {table.shape}")
+    return _counts(table, path)
+
+def load_xy(path, x_column=0, y_column=1, **options):
+    """
+    Load x and y values for linear_regression / regression_stats. Raw binary
+    files are read as max(x_column, y_column) + 1 columns unless `columns` is given.
+
+    Returns:
+    tuple: (x_values, y_values), views of the loaded table's columns
+    """
+    array = load_array(path, **_pair_options(options, x_column, y_column))
+    return _column_pair(array, x_column, y_column, path)
+
+def load_frequency_table(path, value_column=0, frequency_column=1, **options):
+    """
+    Load (value, frequency) pairs for median / frequency_stats. Raw binary files
+    are read as max(value_column, frequency_column) + 1 columns unless `columns` is given.
+
+    Returns:
+    tuple: (values, frequencies), frequencies as integers; frequencies that are
+    not whole numbers raise ValueError
+    """
+    array = load_array(path, **_pair_options(options, value_column, frequency_column))
+    values, frequencies = _column_pair(array, value_column, frequency_column, path)
+    return values, _counts(frequencies, path)
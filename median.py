@@ -1,14 +1,56 @@
 import numpy as np
-from scipy.stats import chi2_contingency, chisquare, chi2
-from pylatex import Document, Tabular, NoEscape
-from pdf2image import convert_from_path
+from instrument import span
+from render import render_document
+from latex_emit import MAX_TABLE_ROWS, emitter, long_table, table_layout
+from frequency_stats import binned_frequency_table, frequency_statistics, merge_frequency_tables
 import math
 def correct(x):
     if x.is_integer():
         return int(x)
     return x
-def generate_latex_document(values, frequencies):
-    doc = Document()
+def _summary_rows(values, frequencies, layout, max_rows, NoEscape):
+    """
+    At most max_rows (value, frequency) rows: equal-width classes for the binned
+    layout, otherwise the first and last values with the ones between them in one row.
+    The rows follow the sorted distinct values, as the statistics do, so the
+    summed row covers exactly the range it is labelled with.
+    """
+    if layout == 'binned':
+        edges, counts = binned_frequency_table(values, frequencies, max_rows)
+        edges = [correct(round(edge, 4)) for edge in edges.tolist()]
+        closing = [r'\rangle'] * (len(counts) - 1) + [']']
+        return [[NoEscape(r'$[%s, %s%s$' % (low, high, close)), count]
+                for low, high, close, count in zip(edges[:-1], edges[1:], closing, counts.tolist())]
+    values, frequencies = merge_frequency_tables((values, frequencies))
+    rows = [[correct(value), freq] for value, freq in zip(values.astype(float).tolist(), frequencies.astype(int).tolist())]
+    if len(rows) <= max_rows:
+        return rows
+    head = (max_rows - 1) // 2
+    tail = max_rows - 1 - head
+    middle = values[head:len(values) - tail]
+    omitted = [NoEscape(r'$[%s, %s]$' % (correct(float(middle.min())), correct(float(middle.max())))),
+               int(frequencies[head:len(values) - tail].sum())]
+    return rows[:head] + [omitted] + rows[len(rows) - tail:]
+
+def _append_median(doc, NoEscape, n, median):
+    if n%2==0:
+        doc.append(NoEscape(r'Medijan je $\frac{1}{2} \cdot x_{(%s)}+\frac{1}{2} \cdot x_{(%s)}=%s$ \\' % (n//2,n//2+1,int(median))))
+    else:
+        doc.append(NoEscape(r'Medijan je $x_{(%s)}=%s$ \\' % ((n+1)//2,int(median))))
+
+def build_document(values, frequencies, fast=True, layout=None, max_rows=MAX_TABLE_ROWS):
+    """
+    Build the frequency table report; with fast (the default) the LaTeX is emitted
+    by latex_emit's string builder instead of pylatex objects, with identical output.
+
+    layout selects how the table is printed (see latex_emit.TABLE_LAYOUTS); by
+    default up to max_rows values are listed in full. Outside the full layout the
+    mean and variance are written with sums instead of one term per value, so the
+    document stays the same size for any number of values; the statistics always
+    cover the whole table.
+    """
+    Doc, Table, NoEscape = emitter(fast)
+    doc = Doc()
     
     doc.packages.append(NoEscape(r'\usepackage{graphicx}'))  # Required for resizebox
     doc.packages.append(NoEscape(r'\usepackage{amsmath}'))
@@ -16,25 +58,45 @@ def generate_latex_document(values, frequencies):
     doc.append(NoEscape(r'\renewcommand{\arraystretch}{1.5}'))
 
     col_labels = ["x", "frekvencije"]
-    full_array = np.repeat(values,frequencies)
-    mean = round(np.mean(full_array),2)
-    var = round(np.var(full_array),2)
+    stats = frequency_statistics(values, frequencies)
+    n = stats['n']
+    mean = round(stats['mean'],2)
+    var = round(stats['variance'],2)
     std_dev = round(math.sqrt(var),2)
+    layout = table_layout(layout, len(values), max_rows)
     # Observed Frequencies Table
     doc.append(NoEscape(r'\textbf{\huge Tablica\\}'))
-    doc.append(NoEscape(r'\resizebox{0.4\textwidth}{!}{%'))  # Resize to 75% of text width
-    with doc.create(Tabular('|c|c|' )) as table:
-        # Column labels
-        table.add_hline()
-        table.add_row(col_labels)
-        table.add_hline()
-
-        # Table data with row sums
-        for value, freq in zip(values.astype(float),frequencies.astype(int)):
-            table.add_row([correct(value),freq])
+    if layout == 'full':
+        doc.append(NoEscape(r'\resizebox{0.4\textwidth}{!}{%'))  # Resize to 75% of text width
+        with doc.create(Table('|c|c|' )) as table:
+            # Column labels
+            table.add_hline()
+            table.add_row(col_labels)
             table.add_hline()
 
-    doc.append(NoEscape(r'}'))  # Close resizebox
+            # Table data with row sums
+            for value, freq in zip(values.astype(float).tolist(),frequencies.astype(int).tolist()):
+                table.add_row([correct(value),freq])
+                table.add_hline()
+
+        doc.append(NoEscape(r'}'))  # Close resizebox
+    else:
+        with doc.create(long_table(fast)('|c|c|')) as table:
+            table.add_hline()
+            table.add_row(["razred" if layout == 'binned' else "x", "frekvencije"])
+            table.add_hline()
+            table.end_table_header()
+            for row in _summary_rows(values, frequencies, layout, max_rows, NoEscape):
+                table.add_row(row)
+                table.add_hline()
+        doc.append(NoEscape(r'Broj vrijednosti: %s, ukupna frekvencija: $n=%s$. \\' % (len(values), n)))
+        doc.append(NoEscape(r'\Large \[ \overline{x} = \frac{\sum f_i x_i}{\sum f_i} = \frac{%s}{%s} = %s\] \\'
+                            % (correct(round(float(np.dot(frequencies, values)), 4)), n, correct(mean))))
+        _append_median(doc, NoEscape, n, stats['median'])
+        doc.append(NoEscape(r'\[ \text{var} = \frac{\sum f_i (x_i-\overline{x})^2}{\sum f_i} = \frac{%s}{%s} = %s \]'
+                            % (correct(round(float(np.dot(frequencies, (values - mean) ** 2)), 4)), n, correct(var))))
+        doc.append(NoEscape(r'\text{std. devijacija} $= \sqrt{%s} = %s$ \\' % (correct(var), std_dev)))
+        return doc
     numerator_terms = ' + '.join(f'{f} \\cdot {correct(x)}' for f, x in zip(frequencies, values))
     doc.append(NoEscape(r'\Large \[ \overline{x} = \frac{'))
     doc.append(NoEscape(numerator_terms))
@@ -42,10 +104,7 @@ def generate_latex_document(values, frequencies):
     denominator = ' + '.join(map(str, frequencies))
     doc.append(NoEscape(denominator))
     doc.append(NoEscape(r'} = %s\] \\'% (correct(mean))))
-    if len(full_array)%2==0:
-        doc.append(NoEscape(r'Medijan je $\frac{1}{2} \cdot x_{(%s)}+\frac{1}{2} \cdot x_{(%s)}=%s$ \\' % (int(len(full_array)/2),int(len(full_array)/2+1),int(np.median(full_array)))))
-    else:
-        doc.append(NoEscape(r'Medijan je $x_{(%s)}=%s$ \\' % (int((len(full_array)+1)/2),int(np.median(full_array)))))
+    _append_median(doc, NoEscape, n, stats['median'])
     
     doc.append(NoEscape(r'\begin{align*}'))
     doc.append(NoEscape(r'\hspace*{-\leftmargin} '))
@@ -61,23 +120,28 @@ def generate_latex_document(values, frequencies):
     doc.append(NoEscape(r'\end{align*}'))
     doc.append(NoEscape(r'\text{std. devijacija} $= \sqrt{%s} = %s$ \\' % (correct(var), std_dev)))
     #for value,freq in zip()
-    doc.generate_pdf('median', clean_tex=False)
-    image = convert_from_path('median.pdf')
-    image[0].save('median.png','PNG')
+    return doc
+
+def generate_latex_document(values, frequencies, filename='median', layout=None, max_rows=MAX_TABLE_ROWS,
+                            **render_options):
+    with span('report', report='median', size=len(values)):
+        with span('build'):
+            doc = build_document(values, frequencies, layout=layout, max_rows=max_rows)
+        return render_document(doc, filename, **render_options)
 
 # Example usage
 if __name__ == "__main__":
-    values = []
-    freqs = []
+    import sys
+    from loaders import load_frequency_table
 
-    print("Enter the values (space-separated numbers):")
-    row = input().strip()
-    values.append([float(x.strip()) for x in row.split()])
-    values = np.array(values).flatten()
-    print("Enter the frequencies of the values (space-separated numbers):")
-    row = input().strip()
-    freqs.append([int(x.strip()) for x in row.split()])
-    freqs = np.array(freqs).flatten()
+    # Value and frequency columns can also be given as a file (.csv, .txt, .npy, ...)
+    if len(sys.argv) > 1:
+        values, freqs = load_frequency_table(sys.argv[1])
+    else:
+        print("Enter the values (space-separated numbers):")
+        values = np.array(input().split(), dtype=float)
+        print("Enter the frequencies of the values (space-separated numbers):")
+        freqs = np.array(input().split(), dtype=np.int64)
     print("values:",values)
     print("frequencies:",freqs)
     generate_latex_document(values,freqs)
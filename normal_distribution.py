@@ -1,15 +1,213 @@
-from scipy.stats import norm
-from pylatex import Document, Tabular, NoEscape
-from pdf2image import convert_from_path
+import argparse
+import math
+import sys
 
-def calculate_normal_probabilities(mean, std_dev, filename):
-    doc = Document()
+import numpy as np
+from instrument import span
+from render import render_document
+from latex_emit import TexDocument, emitter
+
+CONDITIONS = ('<>', '<', '>')
+
+# The Φ lookup table covers z = -Z_MAX ... Z_MAX in steps of 0.01; beyond that Φ rounds to 0 or 1
+Z_MAX = 6.0
+_phi_table = None
+
+def phi_table():
+    """
+    Φ(z) for z = -6.00, -5.99, ..., 6.00, computed once with math.erfc (no SciPy).
+    """
+    global _phi_table
+    if _phi_table is None:
+        steps = int(round(Z_MAX * 100))
+        _phi_table = np.array([0.5 * math.erfc(-k / 100 / math.sqrt(2)) for k in range(-steps, steps + 1)])
+    return _phi_table
+
+def phi(z, use_table=False):
+    """
+    Standard normal CDF of an array of z-scores.
+
+    With use_table the values come from phi_table(), which is exact for z rounded
+    to 2 decimals as on the worksheets; otherwise scipy.stats.norm.cdf is used.
+    """
+    z = np.asarray(z, dtype=float)
+    if use_table:
+        missing = np.isnan(z)
+        idx = np.rint((np.clip(np.where(missing, 0, z), -Z_MAX, Z_MAX) + Z_MAX) * 100).astype(int)
+        return np.where(missing, np.nan, phi_table()[idx])
+    from scipy.stats import norm
+    return norm.cdf(z, 0, 1)
+
+def round_half_even(x, ndigits):
+    """
+    Round an array like Python's round() on each element.
+
+    np.round scales by 10**ndigits first, which can flip values sitting next to a
+    tie (e.g. 3.245 -> 3.24); those few elements are rounded with round() instead.
+    """
+    rounded = np.round(x, ndigits)
+    scaled = np.abs(x) * 10 ** ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if np.any(near_tie):
+        rounded[near_tie] = [round(value, ndigits) for value in x[near_tie].tolist()]
+    return rounded
+
+def evaluate_queries(mean, std_dev, conditions, lower, upper=None, use_table=False):
+    """
+    Evaluate many probability queries in one vectorized pass.
+
+    Parameters:
+    - mean, std_dev (float or array): Parameters of the normal distribution, either
+      shared by all queries or one per query
+    - conditions (array of str): '<>', '<' or '>' per query
+    - lower (array of float): The lower bound for '<>', the value for '<' and '>'
+    - upper (array of float, optional): The upper bound for '<>', NaN otherwise
+    - use_table (bool): Look Φ up in phi_table() instead of calling SciPy
+
+    Returns:
+    dict: Arrays 'z_lower', 'z_upper', 'p_lower', 'p_upper' and 'probability', all
+    rounded like the worksheet steps
+    """
+    conditions = np.asarray(conditions)
+    invalid = ~np.isin(conditions, CONDITIONS)
+    if np.any(invalid):
+        raise ValueError(f"Invalid condition {conditions[invalid][0]!r}, expected one of: <>, <, >")
+    lower = np.asarray(lower, dtype=float)
+    upper = np.full(lower.shape, np.nan) if upper is None else np.asarray(upper, dtype=float)
+    mean = np.asarray(mean, dtype=float)
+    std_dev = np.asarray(std_dev, dtype=float)
+
+    z_lower = round_half_even(np.atleast_1d((lower - mean) / std_dev), 2)
+    z_upper = round_half_even(np.atleast_1d((upper - mean) / std_dev), 2)
+    with span('compute', report='normal_distribution', size=z_lower.size, table=use_table):
+        p_lower = np.round(phi(z_lower, use_table), 4)
+        p_upper = np.round(phi(z_upper, use_table), 4)
+    probability = np.where(conditions == '<', p_lower,
+                           np.where(conditions == '>', np.round(1 - p_lower, 4), np.round(p_upper - p_lower, 4)))
+    return {
+        'z_lower': z_lower,
+        'z_upper': z_upper,
+        'p_lower': p_lower,
+        'p_upper': p_upper,
+        'probability': probability
+    }
+
+def _no_escape(doc):
+    # A pylatex Document (fast=False) only leaves pylatex's own NoEscape unescaped
+    return emitter(isinstance(doc, TexDocument))[2]
+
+def new_document(mean, std_dev, fast=True):
+    Doc, _, NoEscape = emitter(fast)
+    doc = Doc()
     doc.packages.append(NoEscape(r'\usepackage{graphicx}'))  # Required for resizebox
     doc.packages.append(NoEscape(r'\usepackage{amsmath}'))
     doc.packages.append(NoEscape(r'\usepackage{enumerate}'))
     #doc.append(NoEscape(r'\begin{flushleft}'))
     doc.append(NoEscape(r'\Large $ X \sim N(' + str(mean) + r', ' + str(std_dev) + r'^2) $'))
     #doc.append(NoEscape(r'\end{flushleft}'))
+    return doc
+
+def append_query_steps(doc, mean, std_dev, condition, bounds, z_lower, z_upper, p_lower, p_upper, probability):
+    """
+    Append the enumerated solution steps for one evaluated query.
+    """
+    NoEscape = _no_escape(doc)
+    if condition == "<>":
+        lower_bound, upper_bound = bounds
+        doc.append(NoEscape(r'\Large \item $P(%s < X < %s)$' % (lower_bound, upper_bound)))
+        doc.append(NoEscape(r'$=P\left(\frac{%s-%s}{%s} < \frac{X-%s}{%s} < \frac{%s-%s}{%s}\right)$' % (lower_bound,mean,std_dev,mean,std_dev,upper_bound,mean,std_dev)))
+        doc.append(NoEscape(r'$=P\left(%s < Z < %s \right)$' % (z_lower,z_upper)))
+        doc.append(NoEscape(r'$=\Phi\left( %s \right) - \Phi\left( %s \right)$' % (z_upper, z_lower)))
+        doc.append(NoEscape(r'$=%s - %s = %s $' % (p_upper, p_lower, probability)))
+    elif condition == "<":
+        value, = bounds
+        doc.append(NoEscape(r'\item $P(X < %s)$' % (value)))
+        doc.append(NoEscape(r'$=P\left(\frac{X-%s}{%s} < \frac{%s-%s}{%s}\right)$' % (mean,std_dev,value,mean,std_dev)))
+        doc.append(NoEscape(r'$=P\left(Z < %s \right)=\Phi\left( %s \right)$' % (z_lower,z_lower)))
+        doc.append(NoEscape(r'$= %s $' % (probability)))
+    else:
+        value, = bounds
+        doc.append(NoEscape(r'\item $P(X > %s) = 1 - P(X < %s)$' % (value, value)))
+        doc.append(NoEscape(r'$=1-P\left(\frac{X-%s}{%s} < \frac{%s-%s}{%s}\right)$' % (mean,std_dev,value,mean,std_dev)))
+        doc.append(NoEscape(r'$=1-P\left(Z < %s \right)$' % (z_lower)))
+        doc.append(NoEscape(r'$=1 - \Phi\left( %s \right) =  %s $' % (z_lower,probability)))
+
+def _query_arrays(queries):
+    conditions = [condition for condition, *_ in queries]
+    lower = [bounds[0] for _, *bounds in queries]
+    upper = [bounds[1] if len(bounds) > 1 else np.nan for _, *bounds in queries]
+    return conditions, lower, upper
+
+def append_query(doc, mean, std_dev, condition, *bounds, use_table=False):
+    """
+    Append the enumerated solution steps for one probability query.
+
+    Parameters:
+    - condition (str): '<>' for a range, '<' for less than, '>' for greater than
+    - bounds (float): lower and upper bound for '<>', a single value otherwise
+
+    Returns:
+    float: The rounded probability
+    """
+    result = evaluate_queries(mean, std_dev, *_query_arrays([(condition,) + bounds]), use_table=use_table)
+    values = {key: column[0] for key, column in result.items()}
+    append_query_steps(doc, mean, std_dev, condition, bounds, **values)
+    return values['probability']
+
+def build_document(mean, std_dev, queries, use_table=False, result=None, fast=True):
+    """
+    Build the report for a list of queries such as ('<', 100) or ('<>', 109, 112).
+    All queries are evaluated in one vectorized pass, unless the matching
+    evaluate_queries `result` is passed in. With fast (the default) the LaTeX is
+    emitted by latex_emit's string builder instead of pylatex objects.
+    """
+    doc = new_document(mean, std_dev, fast)
+    NoEscape = _no_escape(doc)
+    doc.append(NoEscape(r'\begin{enumerate}[a)]'))
+    if queries:
+        if result is None:
+            result = evaluate_queries(mean, std_dev, *_query_arrays(queries), use_table=use_table)
+        for idx, (condition, *bounds) in enumerate(queries):
+            append_query_steps(doc, mean, std_dev, condition, bounds,
+                               **{key: column[idx] for key, column in result.items()})
+    doc.append(NoEscape(r'\end{enumerate}'))
+    return doc
+
+def generate_latex_document(mean, std_dev, queries, filename='normal_distribution', use_table=False, **render_options):
+    with span('report', report='normal_distribution', size=len(queries)):
+        with span('build'):
+            doc = build_document(mean, std_dev, queries, use_table)
+        return render_document(doc, filename, **render_options)
+
+def load_queries(path):
+    """
+    Read queries from a text file, one per line: '<condition> <value> [<upper>]',
+    optionally prefixed with '<mean> <std_dev>' to mix several distributions.
+
+    Returns:
+    list of tuple: (mean, std_dev, condition, *bounds); mean and std_dev are None
+    when the line does not specify them
+    """
+    queries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            tokens = line.split()
+            if not tokens or tokens[0].startswith('#'):
+                continue
+            params = [None, None]
+            if tokens[0] not in CONDITIONS:
+                params, tokens = [float(t) for t in tokens[:2]], tokens[2:]
+            bounds = [float(b) for b in tokens[1:]]
+            queries.append(tuple(params) + (tokens[0],) + tuple(int(b) if b.is_integer() else b for b in bounds))
+    return queries
+
+def read_number(prompt):
+    value = float(input(prompt).strip())
+    if value.is_integer():
+        value = int(value)
+    return value
+
+def calculate_normal_probabilities(mean, std_dev, filename):
     """
     Calculate probabilities based on a normal distribution.
 
@@ -17,78 +215,112 @@ def calculate_normal_probabilities(mean, std_dev, filename):
     - mean (float): Mean of the normal distribution
     - std_dev (float): Standard deviation of the normal distribution
     """
-    doc.append(NoEscape(r'\begin{enumerate}[a)]'))
-    print("Enter probability condition (<>, <, >) or blank to exit:")
+    # The report span covers the whole session, so the per-query spans nest under it;
+    # only building the document is timed as 'build', never the time spent at the prompts
+    with span('report', report='normal_distribution', interactive=True) as report:
+        with span('build'):
+            doc = new_document(mean, std_dev)
+            NoEscape = _no_escape(doc)
+            doc.append(NoEscape(r'\begin{enumerate}[a)]'))
+        queries = 0
+
+        def add_query(condition, *bounds):
+            with span('build', query=queries):
+                return append_query(doc, mean, std_dev, condition, *bounds)
 
-    while True:
-        condition = input("Condition (<> for range, < for less than, > for greater than): ").strip()
+        print("Enter probability condition (<>, <, >) or blank to exit:")
+
+        while True:
+            condition = input("Condition (<> for range, < for less than, > for greater than): ").strip()
         
-        if not condition:
-            print("Exiting program.")
-            break
-
-        if condition == "<>":
-            try:
-                lower_bound = float(input("Enter lower bound: ").strip())
-                if lower_bound.is_integer():
-                    lower_bound = int(lower_bound)
-                upper_bound = float(input("Enter upper bound: ").strip())
-                if upper_bound.is_integer():
-                    upper_bound = int(upper_bound)
-                z_lower = round((lower_bound-mean)/std_dev,2)
-                z_upper = round((upper_bound-mean)/std_dev,2)
-                prob_lower = round(norm.cdf(z_lower, 0, 1),4)
-                prob_upper = round(norm.cdf(z_upper, 0, 1),4)
-                probability = round(prob_upper-prob_lower,4)
-                doc.append(NoEscape(r'\Large \item $P(%s < X < %s)$' % (lower_bound, upper_bound)))
-                doc.append(NoEscape(r'$=P\left(\frac{%s-%s}{%s} < \frac{X-%s}{%s} < \frac{%s-%s}{%s}\right)$' % (lower_bound,mean,std_dev,mean,std_dev,upper_bound,mean,std_dev)))
-                doc.append(NoEscape(r'$=P\left(%s < Z < %s \right)$' % (z_lower,z_upper)))
-                doc.append(NoEscape(r'$=\Phi\left( %s \right) - \Phi\left( %s \right)$' % (z_upper, z_lower)))
-                doc.append(NoEscape(r'$=%s - %s = %s $' % (prob_upper, prob_lower, probability)))
-                if lower_bound >= upper_bound:
-                    print("Error: Lower bound should be less than upper bound. Try again.")
-                    continue
-                print(f"Probability that the variable is between {lower_bound} and {upper_bound}: {probability:.4f}")
-            except ValueError:
-                print("Invalid input. Please enter numeric values.")
-
-        elif condition == "<":
-            try:
-                value = float(input("Enter a value: ").strip())
-                if value.is_integer():
-                    value = int(value)
-                z = round((value-mean)/std_dev,2)
-                probability = round(norm.cdf(z, 0, 1),4)
-                doc.append(NoEscape(r'\item $P(X < %s)$' % (value)))
-                doc.append(NoEscape(r'$=P\left(\frac{X-%s}{%s} < \frac{%s-%s}{%s}\right)$' % (mean,std_dev,value,mean,std_dev)))
-                doc.append(NoEscape(r'$=P\left(Z < %s \right)=\Phi\left( %s \right)$' % (z,z)))
-                doc.append(NoEscape(r'$= %s $' % (probability)))
-                print(f"Probability that the variable is less than {value}: {probability:.4f}")
-            except ValueError:
-                print("Invalid input. Please enter a numeric value.")
-
-        elif condition == ">":
-            try:
-                value = float(input("Enter a value: ").strip())
-                if value.is_integer():
-                    value = int(value)
-                z = round((value-mean)/std_dev,2)
-                probability = round(1-round(norm.cdf(z, 0, 1),4),4)
-                doc.append(NoEscape(r'\item $P(X > %s) = 1 - P(X < %s)$' % (value, value)))
-                doc.append(NoEscape(r'$=1-P\left(\frac{X-%s}{%s} < \frac{%s-%s}{%s}\right)$' % (mean,std_dev,value,mean,std_dev)))
-                doc.append(NoEscape(r'$=1-P\left(Z < %s \right)$' % (z)))
-                doc.append(NoEscape(r'$=1 - \Phi\left( %s \right) =  %s $' % (z,probability)))
-                print(f"Probability that the variable is greater than {value}: {probability:.4f}")
-            except ValueError:
-                print("Invalid input. Please enter a numeric value.")
+            if not condition:
+                print("Exiting program.")
+                break
+
+            if condition == "<>":
+                try:
+                    lower_bound = read_number("Enter lower bound: ")
+                    upper_bound = read_number("Enter upper bound: ")
+                    probability = add_query(condition, lower_bound, upper_bound)
+                    queries += 1
+                    if lower_bound >= upper_bound:
+                        print("Error: Lower bound should be less than upper bound. Try again.")
+                        continue
+                    print(f"Probability that the variable is between {lower_bound} and {upper_bound}: {probability:.4f}")
+                except ValueError:
+                    print("Invalid input. Please enter numeric values.")
+
+            elif condition == "<":
+                try:
+                    value = read_number("Enter a value: ")
+                    probability = add_query(condition, value)
+                    queries += 1
+                    print(f"Probability that the variable is less than {value}: {probability:.4f}")
+                except ValueError:
+                    print("Invalid input. Please enter a numeric value.")
+
+            elif condition == ">":
+                try:
+                    value = read_number("Enter a value: ")
+                    probability = add_query(condition, value)
+                    queries += 1
+                    print(f"Probability that the variable is greater than {value}: {probability:.4f}")
+                except ValueError:
+                    print("Invalid input. Please enter a numeric value.")
                 
-        else:
-            print("Invalid condition. Please enter one of: <>, <, or >.")
-    doc.append(NoEscape(r'\end{enumerate}'))
-    doc.generate_pdf(filename, clean_tex=False)
-    image = convert_from_path(f'{filename}.pdf')
-    image[0].save(f"{filename}.png",'PNG')
+            else:
+                print("Invalid condition. Please enter one of: <>, <, or >.")
+        doc.append(NoEscape(r'\end{enumerate}'))
+        if report:
+            report.set(size=queries)
+        return render_document(doc, filename)
+
+def run_queries(path, mean=None, std_dev=None, filename='normal_distribution', use_table=False, render=True,
+                **render_options):
+    """
+    Evaluate every query of a query file in one pass, print the probabilities and
+    render one report per distinct (mean, std_dev). Extra keyword arguments are
+    passed to render.render_document.
+    """
+    queries = load_queries(path)
+    means = [mean if m is None else m for m, *_ in queries]
+    std_devs = [std_dev if s is None else s for _, s, *_ in queries]
+    if None in means or None in std_devs:
+        raise ValueError("Queries without their own mean and standard deviation need --mean and --std-dev")
+    if any(s <= 0 for s in std_devs):
+        raise ValueError("Standard deviation must be positive")
+    queries = [tuple(query[2:]) for query in queries]
+    result = evaluate_queries(means, std_devs, *_query_arrays(queries), use_table=use_table)
+    for (condition, *bounds), m, s, probability in zip(queries, means, std_devs, result['probability']):
+        print(f"N({m}, {s}^2): P({' '.join(map(str, [condition] + bounds))}) = {probability:.4f}")
+
+    if render:
+        groups = {}
+        for idx, params in enumerate(zip(means, std_devs)):
+            groups.setdefault(params, []).append(idx)
+        for number, ((m, s), indices) in enumerate(groups.items(), 1):
+            with span('report', report='normal_distribution', size=len(indices)):
+                with span('build'):
+                    doc = build_document(m, s, [queries[i] for i in indices],
+                                         result={key: column[indices] for key, column in result.items()})
+                render_document(doc, filename if len(groups) == 1 else f'{filename}_{number}', **render_options)
+    return result
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normal distribution probabilities worksheet.")
+    parser.add_argument('--queries', help="file with one query per line ('< 100', '<> 109 112', optionally "
+                                          "prefixed with 'mean std_dev'); without it queries are read interactively")
+    parser.add_argument('--mean', type=float, help="mean for queries that do not give their own")
+    parser.add_argument('--std-dev', type=float, help="standard deviation for queries that do not give their own")
+    parser.add_argument('--table', action='store_true', help="look Phi up in a precomputed table instead of SciPy")
+    parser.add_argument('--no-render', action='store_true', help="only print the probabilities")
+    parser.add_argument('-o', '--output', default='normal_distribution', help="output file name without extension")
+    args = parser.parse_args()
+
+    if args.queries is not None:
+        run_queries(args.queries, args.mean, args.std_dev, args.output, args.table, not args.no_render)
+        sys.exit()
+
     # Get mean and standard deviation
     try:
         mean = float(input("Enter the mean of the normal distribution: ").strip())
@@ -0,0 +1,146 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from latex_emit import NoEscape, TexDocument
+from rasterize import convert_dvi, dvi_page_count, page_count, page_targets, rasterize_pdf
+from render import BACKENDS, JOBNAME, compile_tex, dvi_to_pdf
+
+# Written to the LaTeX log when the first page of a problem is shipped out
+_MARKER = re.compile(r'^zadar-problem (\d+) (\d+)$', re.MULTILINE)
+
+def problem_start_pages(log_path):
+    """
+    First page of every problem, read from the markers ProblemSet writes to the LaTeX log.
+
+    Returns:
+    list of int: 1-based page numbers, in problem order
+    """
+    with open(log_path, encoding='latin-1') as f:
+        starts = {int(problem): int(page) for problem, page in _MARKER.findall(f.read())}
+    return [starts[problem] for problem in sorted(starts)]
+
+def extract_pages(pdf_path, first, last, target):
+    """
+    Copy pages first..last of a PDF into `target` with poppler's pdfseparate and pdfunite.
+    """
+    if first == last:
+        subprocess.check_output(['pdfseparate', '-f', str(first), '-l', str(last), pdf_path, target],
+                                stderr=subprocess.STDOUT)
+        return target
+    with tempfile.TemporaryDirectory(prefix='zadar-split-') as tmp:
+        pattern = os.path.join(tmp, 'page-%d.pdf')
+        subprocess.check_output(['pdfseparate', '-f', str(first), '-l', str(last), pdf_path, pattern],
+                                stderr=subprocess.STDOUT)
+        subprocess.check_output(['pdfunite'] + [pattern % page for page in range(first, last + 1)] + [target],
+                                stderr=subprocess.STDOUT)
+    return target
+
+class ProblemSet:
+    """
+    Many reports in one document, compiled with a single LaTeX run and split back
+    into one PDF and preview per problem.
+
+    Every problem starts on a new page and is kept in a TeX group, so settings
+    such as \\arraystretch do not leak into the next problem.
+    """
+
+    def __init__(self):
+        self.doc = TexDocument()
+        self.names = []
+
+    def add(self, name, report):
+        """
+        Append a report built by one of the build_document functions (with fast=True).
+
+        Parameters:
+        name: str
+            Output file name of the problem, without extension
+        report: TexDocument
+            The report of the problem
+        """
+        if not isinstance(report, TexDocument):
+            raise TypeError("Only latex_emit.TexDocument reports (fast=True) can be combined")
+        if name in self.names:
+            raise ValueError(f"Problem names must be unique, {name!r} is used twice")
+        self.doc.packages.extend(report.packages)
+        if self.names:
+            self.doc.append(NoEscape(r'\clearpage'))
+        self.doc.append(NoEscape(r'\begingroup'))
+        # Non-immediate, so \thepage is expanded on the page the problem starts on
+        self.doc.append(NoEscape(r'\write-1{zadar-problem %d \thepage}' % len(self.names)))
+        self.doc.extend(report.body)
+        self.doc.append(NoEscape(r'\endgroup'))
+        self.names.append(name)
+
+    def render(self, output_dir='.', filename='problem_set', dpi=200, fmt='png', format_dir=None, pages=1,
+               raster_workers=1, backend='pdf', with_pdf=None):
+        """
+        Compile all problems at once and write the combined document plus one PDF
+        and one or more images per problem.
+
+        Parameters:
+        output_dir: str
+            Directory receiving '<filename>.tex/.pdf' and '<name>.pdf/.<fmt>' per problem
+        filename: str, optional
+            File name of the combined document, without extension
+        pages: int, iterable of int or None, optional
+            Page(s) of every problem to rasterize, counted from the first page of
+            that problem (default 1); None rasterizes all of its pages
+        dpi, fmt, format_dir, raster_workers, backend, with_pdf:
+            As for render.render_document
+
+        Returns:
+        dict: 'tex' and 'pdf' of the combined document and 'problems', one dict
+        per problem with its 'name', 'pages' (in the combined document), 'pdf' and
+        'image' ('image' is a list when `pages` is not a single int)
+        """
+        if not self.names:
+            raise ValueError("The problem set is empty")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {tuple(BACKENDS)}")
+        compiler, _ = BACKENDS[backend]
+        if with_pdf is None:
+            with_pdf = backend == 'pdf'
+        fmt = fmt.lower()
+        single = isinstance(pages, int)
+        os.makedirs(output_dir, exist_ok=True)
+        tex = self.doc.dumps()
+        combined = os.path.join(output_dir, filename)
+
+        with tempfile.TemporaryDirectory(prefix='zadar-') as workdir:
+            output_path = compile_tex(tex, workdir, format_dir, compiler)
+            log_path = os.path.join(workdir, JOBNAME + '.log')
+            starts = problem_start_pages(log_path)
+            if len(starts) != len(self.names):
+                raise RuntimeError(f"Found {len(starts)} of {len(self.names)} problems in the LaTeX log")
+            pdf_path = output_path if backend == 'pdf' else dvi_to_pdf(output_path) if with_pdf else None
+            total = page_count(pdf_path) if pdf_path else dvi_page_count(log_path)
+            ranges = list(zip(starts, [start - 1 for start in starts[1:]] + [total]))
+
+            problems, raster_pages, raster_targets = [], [], []
+            for name, (first, last) in zip(self.names, ranges):
+                relative = [pages] if single else range(1, last - first + 2) if pages is None else list(pages)
+                if any(page < 1 or first + page - 1 > last for page in relative):
+                    raise ValueError(f"Problem {name!r} has only {last - first + 1} page(s)")
+                targets = page_targets(os.path.join(output_dir, name), relative, fmt)
+                raster_pages.extend(first + page - 1 for page in relative)
+                raster_targets.extend(targets)
+                problem_pdf = None
+                if with_pdf:
+                    problem_pdf = extract_pages(pdf_path, first, last, os.path.join(output_dir, f'{name}.pdf'))
+                problems.append({'name': name, 'pages': list(range(first, last + 1)), 'pdf': problem_pdf,
+                                 'image': targets[0] if single else targets})
+
+            # All previews come from the one compiled document, in a single pass over its pages
+            if backend == 'dvi':
+                convert_dvi(output_path, raster_targets, raster_pages, dpi, fmt, raster_workers)
+            else:
+                rasterize_pdf(output_path, raster_targets, raster_pages, dpi, fmt, raster_workers)
+            with open(f'{combined}.tex', 'w', encoding='utf-8') as f:
+                f.write(tex)
+            if with_pdf:
+                shutil.move(pdf_path, f'{combined}.pdf')
+        return {'tex': f'{combined}.tex', 'pdf': f'{combined}.pdf' if with_pdf else None, 'problems': problems}
@@ -0,0 +1,111 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# pdf2image (and PIL with it) is only imported once a PDF is actually rasterized
+
+def page_count(pdf_path):
+    from pdf2image import pdfinfo_from_path
+    return pdfinfo_from_path(pdf_path)['Pages']
+
+def dvi_page_count(log_path):
+    """
+    Number of pages of a DVI file, read from the 'Output written on' line of the LaTeX log.
+    """
+    with open(log_path, encoding='latin-1') as f:
+        match = re.search(r'Output written on .*?\((\d+) pages?', f.read(), re.DOTALL)
+    return int(match.group(1)) if match else 0
+
+def _deliver(path, target):
+    if target is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    shutil.move(path, target)
+    return target
+
+def _rasterize_page(pdf_path, page, dpi, fmt, target):
+    from pdf2image import convert_from_path
+    # pdftoppm writes the page straight to disk; the image is never decoded in Python
+    with tempfile.TemporaryDirectory(prefix='zadar-raster-') as tmp:
+        paths = convert_from_path(pdf_path, dpi=dpi, fmt=fmt, first_page=page, last_page=page,
+                                  output_folder=tmp, output_file='page', single_file=True, paths_only=True)
+        if not paths:
+            raise ValueError(f"Page {page} does not exist in '{pdf_path}'")
+        return _deliver(paths[0], target)
+
+def _convert_dvi_page(dvi_path, page, dpi, fmt, target):
+    with tempfile.TemporaryDirectory(prefix='zadar-dvi-') as tmp:
+        output = os.path.join(tmp, f'page.{fmt}')
+        if fmt == 'svg':
+            # Glyphs are drawn as paths so the SVG does not depend on any font
+            command = ['dvisvgm', '--no-fonts', f'--page={page}', '-o', output, dvi_path]
+        else:
+            command = ['dvipng', '-q', '-D', str(dpi), '-T', 'tight', '-p', str(page), '-l', str(page),
+                       '-o', output, dvi_path]
+        subprocess.check_output(command, stderr=subprocess.STDOUT, cwd=tmp)
+        if not os.path.exists(output):
+            raise ValueError(f"Page {page} does not exist in '{dvi_path}'")
+        return _deliver(output, target)
+
+def _convert_pages(convert_page, path, targets, pages, dpi, fmt, workers):
+    if targets is None:
+        targets = [None] * len(pages)
+    elif len(targets) != len(pages):
+        raise ValueError("Exactly one target path per page is required")
+
+    if workers > 1 and len(pages) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda job: convert_page(path, job[0], dpi, fmt, job[1]),
+                                     zip(pages, targets)))
+    return [convert_page(path, page, dpi, fmt, target) for page, target in zip(pages, targets)]
+
+def rasterize_pdf(pdf_path, targets=None, pages=(1,), dpi=200, fmt='png', workers=1):
+    """
+    Rasterize selected pages of a PDF.
+
+    Parameters:
+    pdf_path: str
+        The PDF to rasterize
+    targets: list of str, optional
+        One output path per page; when omitted the encoded images are returned
+        as bytes instead
+    pages: iterable of int or None, optional
+        1-based page numbers (default: the first page only); None for all pages
+    dpi: int, optional
+        Resolution (default 200)
+    fmt: str, optional
+        'png', 'jpeg', 'tiff' or 'ppm' (default 'png')
+    workers: int, optional
+        Number of pages rasterized in parallel, one pdftoppm process each
+
+    Returns:
+    list: The written paths, or the image bytes, in page order
+    """
+    if pages is None:
+        pages = range(1, page_count(pdf_path) + 1)
+    return _convert_pages(_rasterize_page, pdf_path, targets, list(pages), dpi, fmt, workers)
+
+def convert_dvi(dvi_path, targets=None, pages=(1,), dpi=200, fmt='png', workers=1):
+    """
+    Convert selected pages of a DVI file to PNG (dvipng) or SVG (dvisvgm),
+    without producing a PDF first.
+
+    Takes the same arguments as rasterize_pdf, except that `pages` must be given
+    explicitly (see dvi_page_count) and `fmt` is 'png' or 'svg'. PNG images are
+    cropped to the page content.
+    """
+    if fmt not in ('png', 'svg'):
+        raise ValueError(f"The DVI backend renders 'png' or 'svg', not {fmt!r}")
+    return _convert_pages(_convert_dvi_page, dvi_path, targets, list(pages), dpi, fmt, workers)
+
+def page_targets(filename, pages, fmt):
+    """
+    Output paths for rasterized pages: '<filename>.<fmt>' for a single page,
+    '<filename>-<page>.<fmt>' for several.
+    """
+    if len(pages) == 1:
+        return [f'{filename}.{fmt}']
+    return [f'{filename}-{page}.{fmt}' for page in pages]
@@ -0,0 +1,108 @@
+import itertools
+import math
+
+import numpy as np
+
+def regression_moments(x_values, y_values):
+    """
+    Sufficient statistics of paired data for means, variances and covariance.
+
+    Returns:
+    dict: n, sum_x, sum_y, mean_x, mean_y and the co-moments m2_x = Σ(x-x̄)²,
+    m2_y = Σ(y-ȳ)², c_xy = Σ(x-x̄)(y-ȳ). Results for separate chunks can be
+    combined with merge_moments.
+    """
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    if x_values.shape != y_values.shape:
+        raise ValueError("x and y must have the same number of values")
+    n = x_values.size
+    if n == 0:
+        return {'n': 0, 'sum_x': 0.0, 'sum_y': 0.0, 'mean_x': 0.0, 'mean_y': 0.0,
+                'm2_x': 0.0, 'm2_y': 0.0, 'c_xy': 0.0}
+    sum_x = x_values.sum()
+    sum_y = y_values.sum()
+    dx = x_values - sum_x / n
+    dy = y_values - sum_y / n
+    return {
+        'n': n,
+        'sum_x': sum_x,
+        'sum_y': sum_y,
+        'mean_x': sum_x / n,
+        'mean_y': sum_y / n,
+        'm2_x': np.sum(dx * dx),
+        'm2_y': np.sum(dy * dy),
+        'c_xy': np.sum(dx * dy)
+    }
+
+def merge_moments(a, b):
+    """
+    Combine the moments of two disjoint chunks (Chan et al. pairwise update).
+    """
+    n = a['n'] + b['n']
+    if a['n'] == 0 or b['n'] == 0:
+        return dict(b if a['n'] == 0 else a)
+    delta_x = b['mean_x'] - a['mean_x']
+    delta_y = b['mean_y'] - a['mean_y']
+    weight = a['n'] * b['n'] / n
+    return {
+        'n': n,
+        'sum_x': a['sum_x'] + b['sum_x'],
+        'sum_y': a['sum_y'] + b['sum_y'],
+        'mean_x': a['mean_x'] + delta_x * b['n'] / n,
+        'mean_y': a['mean_y'] + delta_y * b['n'] / n,
+        'm2_x': a['m2_x'] + b['m2_x'] + delta_x * delta_x * weight,
+        'm2_y': a['m2_y'] + b['m2_y'] + delta_y * delta_y * weight,
+        'c_xy': a['c_xy'] + b['c_xy'] + delta_x * delta_y * weight
+    }
+
+def moments_from_chunks(chunks):
+    """
+    Fold an iterable of (x_values, y_values) chunks into one set of moments.
+    """
+    moments = regression_moments([], [])
+    for x_values, y_values in chunks:
+        moments = merge_moments(moments, regression_moments(x_values, y_values))
+    return moments
+
+def moments_from_csv(path, x_column=0, y_column=1, delimiter=',', skiprows=0, chunk_rows=1_000_000):
+    """
+    Moments of two columns of a CSV file, read `chunk_rows` lines at a time so the
+    file never has to fit in memory.
+    """
+    def chunks():
+        with open(path, encoding='utf-8') as f:
+            for _ in range(skiprows):
+                next(f)
+            while True:
+                lines = list(itertools.islice(f, chunk_rows))
+                if not lines:
+                    return
+                data = np.loadtxt(lines, delimiter=delimiter, usecols=(x_column, y_column), ndmin=2)
+                yield data[:, 0], data[:, 1]
+    return moments_from_chunks(chunks())
+
+def regression_summary(moments, ddof=0):
+    """
+    Means, variances, covariance, correlation and the regression line y = slope*x + intercept.
+
+    Parameters:
+    moments: dict
+        Result of regression_moments / merge_moments
+    ddof: int, optional
+        Delta degrees of freedom of the variances and covariance (default 0,
+        the population values used in the reports)
+    """
+    n = moments['n']
+    slope = moments['c_xy'] / moments['m2_x']
+    return {
+        'n': n,
+        'mean_x': moments['mean_x'],
+        'mean_y': moments['mean_y'],
+        'var_x': moments['m2_x'] / (n - ddof),
+        'var_y': moments['m2_y'] / (n - ddof),
+        'covariance': moments['c_xy'] / (n - ddof),
+        'correlation': moments['c_xy'] / math.sqrt(moments['m2_x'] * moments['m2_y']),
+        'slope': slope,
+        'intercept': moments['mean_y'] - slope * moments['mean_x']
+    }
@@ -0,0 +1,186 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from instrument import span
+from latex_format import compile_with_format
+from rasterize import convert_dvi, dvi_page_count, page_count, page_targets, rasterize_pdf
+
+JOBNAME = 'report'
+
+# LaTeX compiler and output file extension of each render backend
+BACKENDS = {'pdf': ('pdflatex', 'pdf'), 'dvi': ('latex', 'dvi')}
+
+# Log messages asking for another pass, e.g. longtable's column widths settle
+# through the .aux file like latexmk would rerun for
+_RERUN = re.compile(r'Rerun (LaTeX|to get)|Column widths have changed|Table widths have changed')
+
+# Passes after which a document is used as it is, even if LaTeX still asks for a rerun
+MAX_PASSES = 3
+
+def needs_rerun(log_path):
+    """
+    Whether the LaTeX log at `log_path` asks for another compiler pass.
+    """
+    try:
+        with open(log_path, encoding='latin-1') as f:
+            return _RERUN.search(f.read()) is not None
+    except FileNotFoundError:
+        return False
+
+def compile_tex(tex, workdir, format_dir=None, compiler='pdflatex'):
+    """
+    Compile `tex` into '<workdir>/report.pdf' ('report.dvi' with compiler='latex'),
+    running the compiler again (up to MAX_PASSES times) while the log asks for it.
+
+    All intermediate files (.aux, .log) stay inside `workdir`, so jobs compiled in
+    different work directories never see each other's files.
+
+    Returns:
+    str: Path of the generated PDF or DVI file
+    """
+    filename = os.path.join(workdir, JOBNAME)
+    for _ in range(MAX_PASSES):
+        if format_dir is not None:
+            compile_with_format(tex, filename, format_dir, compiler)
+        else:
+            with open(filename + '.tex', 'w', encoding='utf-8') as f:
+                f.write(tex)
+            subprocess.check_output([compiler, '-interaction=nonstopmode', JOBNAME + '.tex'],
+                                    stderr=subprocess.STDOUT, cwd=workdir)
+        if not needs_rerun(filename + '.log'):
+            break
+    return filename + ('.dvi' if compiler == 'latex' else '.pdf')
+
+def dvi_to_pdf(dvi_path):
+    """
+    Convert a DVI file with dvipdfmx into a PDF next to it and return its path.
+    """
+    subprocess.check_output(['dvipdfmx', '-q', os.path.basename(dvi_path)],
+                            stderr=subprocess.STDOUT, cwd=os.path.dirname(dvi_path))
+    return os.path.splitext(dvi_path)[0] + '.pdf'
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def render_document(doc, filename=None, cache=None, dpi=200, fmt='png', format_dir=None, in_memory=False,
+                    pages=1, raster_workers=1, backend='pdf', with_pdf=None):
+    """
+    Compile a pylatex document and rasterize selected pages of it.
+
+    Every call compiles in its own temporary work directory, so any number of
+    renders can run at once in threads or processes; only the final artifacts are
+    moved to `filename`.
+
+    Parameters:
+    doc: pylatex.Document
+        Fully built report document
+    filename: str, optional
+        Output path without extension; '<filename>.tex', '.pdf' and '.<fmt>'
+        are written next to each other. May be None when `in_memory` is set
+    cache: RenderCache, optional
+        When given, identical LaTeX sources are served from the cache without
+        running pdflatex or the rasterizer. Not used when `pages` is None
+    dpi: int, optional
+        Resolution of the images (default 200)
+    fmt: str, optional
+        Image format (default 'png')
+    format_dir: str, optional
+        Directory of precompiled preamble formats; when given, pdflatex loads the
+        preamble from a format file instead of reading every package again
+    in_memory: bool, optional
+        Return the LaTeX source and the PDF/image contents instead of paths
+    pages: int, iterable of int or None, optional
+        1-based page(s) to rasterize (default 1, a preview of the first page);
+        None rasterizes every page. When several pages are requested the images
+        are written as '<filename>-<page>.<fmt>'
+    raster_workers: int, optional
+        Number of pages rasterized in parallel
+    backend: str, optional
+        'pdf' (default) compiles with pdflatex and rasterizes the PDF with
+        poppler; 'dvi' compiles with latex and converts the DVI directly with
+        dvipng (fmt='png') or dvisvgm (fmt='svg')
+    with_pdf: bool, optional
+        Whether to produce the PDF as well; defaults to True for the 'pdf' backend
+        and False for 'dvi', which then converts the DVI with dvipdfmx
+
+    Returns:
+    dict: 'tex', 'pdf' and 'image' (paths, or str/bytes contents when `in_memory`)
+    and 'cached', telling whether they were served from the cache. 'image' is a
+    list when `pages` is not a single int; 'pdf' is None when no PDF was produced
+    """
+    if filename is None and not in_memory:
+        raise ValueError("Either a filename or in_memory=True is required")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {tuple(BACKENDS)}")
+    compiler, _ = BACKENDS[backend]
+    if with_pdf is None:
+        with_pdf = backend == 'pdf'
+    fmt = fmt.lower()
+    single = isinstance(pages, int)
+    page_list = [pages] if single else None if pages is None else list(pages)
+    with span('emit') as s:
+        tex = doc.dumps()
+        if s:
+            s.set(tex_bytes=len(tex.encode('utf-8')))
+    use_cache = cache is not None and page_list is not None
+    cached = None
+    if use_cache:
+        with span('cache') as s:
+            key = cache.key(tex, dpi=dpi, fmt=fmt, pages=page_list, backend=backend)
+            cached = cache.get(key, fmt, page_list, with_pdf)
+            s.set(hit=cached is not None)
+
+    with tempfile.TemporaryDirectory(prefix='zadar-') as workdir:
+        if cached is not None:
+            pdf_path, image_paths = cached
+        else:
+            with span('compile', compiler=compiler, format=format_dir is not None) as s:
+                output_path = compile_tex(tex, workdir, format_dir, compiler)
+                if s:
+                    s.set(output_bytes=os.path.getsize(output_path))
+            with span('rasterize', backend=backend, fmt=fmt, dpi=dpi) as s:
+                if page_list is None:
+                    if backend == 'dvi':
+                        count = dvi_page_count(os.path.join(workdir, JOBNAME + '.log'))
+                    else:
+                        count = page_count(output_path)
+                    page_list = list(range(1, count + 1))
+                image_targets = page_targets(os.path.join(workdir, JOBNAME), page_list, fmt)
+                if backend == 'dvi':
+                    image_paths = convert_dvi(output_path, image_targets, page_list, dpi, fmt, raster_workers)
+                else:
+                    image_paths = rasterize_pdf(output_path, image_targets, page_list, dpi, fmt, raster_workers)
+                if s:
+                    s.set(pages=len(page_list), output_bytes=sum(os.path.getsize(path) for path in image_paths))
+            if backend == 'dvi':
+                with span('dvipdfmx') as s:
+                    pdf_path = dvi_to_pdf(output_path) if with_pdf else None
+                    if s and pdf_path:
+                        s.set(output_bytes=os.path.getsize(pdf_path))
+            else:
+                pdf_path = output_path if with_pdf else None
+            if use_cache:
+                cache.put(key, fmt, pdf_path, image_paths, page_list)
+
+        if in_memory:
+            images = [_read(path) for path in image_paths]
+            files = {'tex': tex, 'pdf': _read(pdf_path) if pdf_path else None}
+        else:
+            images = page_targets(filename, page_list, fmt)
+            files = {'tex': f'{filename}.tex', 'pdf': f'{filename}.pdf' if pdf_path else None}
+        files['image'] = images[0] if single else images
+        if filename is not None:
+            with open(f'{filename}.tex', 'w', encoding='utf-8') as f:
+                f.write(tex)
+            # Cached artifacts must stay in the cache, fresh ones can simply be moved
+            transfer = shutil.copyfile if cached is not None else shutil.move
+            if pdf_path:
+                transfer(pdf_path, f'{filename}.pdf')
+            for image_path, target in zip(image_paths, page_targets(filename, page_list, fmt)):
+                transfer(image_path, target)
+    files['cached'] = cached is not None
+    return files
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+class RenderCache:
+    """
+    On-disk cache of rendered PDFs and images, keyed by the generated LaTeX source.
+
+    Entries are stored as '<key>.pdf' and one '<key>.p<page>.<fmt>' image per
+    rasterized page in `directory`. Reading an entry refreshes its modification
+    time, and once the cache grows beyond `max_bytes` the least recently used
+    entries are removed.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(tex, **options):
+        """
+        Hash the LaTeX source together with the render options (e.g. dpi, fmt).
+        """
+        digest = hashlib.sha256(tex.encode('utf-8'))
+        for name in sorted(options):
+            digest.update(f'\0{name}={options[name]}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _paths(self, key, fmt, pages):
+        return (os.path.join(self.directory, f'{key}.pdf'),
+                [os.path.join(self.directory, f'{key}.p{page}.{fmt.lower()}') for page in pages])
+
+    def get(self, key, fmt, pages=(1,), with_pdf=True):
+        """
+        Return the cached (pdf_path, image_paths) for `key`, or None on a miss.
+        pdf_path is None when `with_pdf` is False.
+        """
+        pdf_path, image_paths = self._paths(key, fmt, pages)
+        if not with_pdf:
+            pdf_path = None
+        try:
+            for path in ([pdf_path] if with_pdf else []) + image_paths:
+                os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pdf_path, image_paths
+
+    def put(self, key, fmt, pdf_path, image_paths, pages=(1,)):
+        """
+        Copy freshly rendered artifacts into the cache and evict old entries.
+        pdf_path may be None when only images were rendered.
+        """
+        cached_pdf, cached_images = self._paths(key, fmt, pages)
+        sources, targets = list(image_paths), cached_images
+        if pdf_path is not None:
+            sources, targets = [pdf_path] + sources, [cached_pdf] + targets
+        for src, dst in zip(sources, targets):
+            # Copy to a temporary name first so concurrent readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        self.evict()
+
+    def _entries(self):
+        entries = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.endswith('.tmp'):
+                    continue
+                stat = entry.stat()
+                key = entry.name.split('.', 1)[0]
+                size, mtime, paths = entries.get(key, (0, 0, []))
+                entries[key] = (size + stat.st_size, max(mtime, stat.st_mtime), paths + [entry.path])
+        return entries
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in `max_bytes`.
+        """
+        entries = self._entries()
+        total = sum(size for size, _, _ in entries.values())
+        for key, (size, _, paths) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Returns:
+        dict: Hit/miss/eviction counters of this instance and the current cache size
+        """
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for size, _, _ in entries.values()),
+            'max_bytes': self.max_bytes
+        }
@@ -0,0 +1,250 @@
+"""
+Long-running render service, so callers pay neither interpreter start-up nor
+import time per report, and the number of concurrent LaTeX runs stays bounded.
+
+Protocol: newline-delimited JSON over a Unix socket (or localhost TCP with --port).
+Every request line is a job as accepted by batch.load_jobs, optionally with an
+'id' that is echoed back; every response line is the batch.run_job result of a
+job (artifact paths, or an 'error'). Responses on one connection are written as
+jobs finish, not in request order. {"command": "stats"} returns the queue state.
+Jobs without a name get a random one; a job named like one that is still queued
+or running is rejected, since both would write the same files.
+
+Jobs wait in a bounded asyncio queue served by `concurrency` workers. When the
+queue is full, the daemon stops reading from the connection until a slot is
+free, so a client cannot pile up more work than the daemon can hold.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import socket
+import stat
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from batch import REPORT_TYPES, run_job
+from render_cache import RenderCache
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'zadar-render.sock')
+
+def preload():
+    """
+    Import everything a job may need, so the first requests do not pay for it.
+    """
+    for name in REPORT_TYPES + ('scipy.stats', 'pdf2image'):
+        importlib.import_module(name)
+
+class RenderDaemon:
+    """
+    Asyncio job queue in front of batch.run_job.
+
+    Parameters:
+    output_dir: str
+        Directory receiving the '<name>.tex/.pdf/.png' files of every job
+    concurrency: int
+        Number of jobs compiled and rasterized at the same time
+    queue_size: int
+        Number of jobs that may wait for a worker before submitters are held back
+    render_options:
+        Passed to render.render_document (cache, dpi, fmt, format_dir, backend, ...)
+    """
+
+    def __init__(self, output_dir='.', concurrency=2, queue_size=32, **render_options):
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.render_options = render_options
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.submitted = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.active = set()  # Names of the queued and running jobs
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize() if self.queue is not None else 0,
+            'queue_size': self.queue_size,
+            'running': self.running,
+            'concurrency': self.concurrency,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+        }
+
+    def _validate(self, job):
+        if job.get('type') not in REPORT_TYPES:
+            raise ValueError(f"Unknown type {job.get('type')!r}, expected one of {REPORT_TYPES}")
+        # Random rather than counted, so a restarted daemon does not overwrite earlier output
+        name = job.setdefault('name', f"{job['type']}_{uuid.uuid4().hex[:12]}")
+        # The name becomes a file name in output_dir and must not point anywhere else
+        if not isinstance(name, str) or os.path.basename(name) != name or name.startswith('.'):
+            raise ValueError(f"Invalid job name {name!r}")
+        if name in self.active:
+            raise ValueError(f"A job named {name!r} is already queued or running")
+
+    async def enqueue(self, job):
+        """
+        Queue a job, waiting while the queue is full.
+
+        Returns:
+        asyncio.Future: Resolves to the run_job result of the job
+        """
+        self._validate(job)
+        self.active.add(job['name'])
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await self.queue.put((job, future, time.perf_counter()))
+        except BaseException:
+            self.active.discard(job['name'])
+            raise
+        self.submitted += 1
+        return future
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future, queued = await self.queue.get()
+            started = time.perf_counter()
+            self.running += 1
+            try:
+                result = await loop.run_in_executor(
+                    self.executor, partial(run_job, job, self.output_dir, **self.render_options))
+                self.completed += 1
+            except Exception as e:
+                result = {'name': job['name'], 'type': job['type'], 'error': f"{type(e).__name__}: {e}"}
+                self.failed += 1
+            finally:
+                self.running -= 1
+                self.active.discard(job['name'])
+                self.queue.task_done()
+            result['queue_seconds'] = started - queued
+            result['render_seconds'] = time.perf_counter() - started
+            if not future.cancelled():
+                future.set_result(result)
+
+    async def _respond(self, writer, request_id, future):
+        result = await future
+        if request_id is not None:
+            result = dict(result, id=request_id)
+        await self._write(writer, result)
+
+    @staticmethod
+    async def _write(writer, message):
+        writer.write(json.dumps(message).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        pending = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                request_id = None
+                try:
+                    job = json.loads(line)
+                    if not isinstance(job, dict):
+                        raise ValueError(f"A request must be a JSON object, got {type(job).__name__}")
+                    request_id = job.pop('id', None)
+                    if job.get('command') == 'stats':
+                        await self._write(writer, dict(self.stats(), **({} if request_id is None else {'id': request_id})))
+                        continue
+                    # Not reading the next request before this one is queued is the backpressure
+                    future = await self.enqueue(job)
+                except (ValueError, AttributeError) as e:
+                    await self._write(writer, {'id': request_id, 'error': f"{type(e).__name__}: {e}"})
+                    continue
+                task = asyncio.create_task(self._respond(writer, request_id, future))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, path=DEFAULT_SOCKET, port=None, host='127.0.0.1'):
+        """
+        Listen on the Unix socket `path`, or on host:port when a port is given, until cancelled.
+        """
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        if port is not None:
+            server = await asyncio.start_server(self._handle, host, port)
+        else:
+            if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+                os.remove(path)  # Left behind by a daemon that did not shut down cleanly
+            server = await asyncio.start_unix_server(self._handle, path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if port is None and os.path.exists(path):
+                os.remove(path)
+            self.executor.shutdown(wait=False)
+
+def submit(jobs, path=DEFAULT_SOCKET, port=None, host='127.0.0.1', timeout=None):
+    """
+    Send jobs to a running daemon and wait for all of their results. Blocking, for
+    callers without an event loop.
+
+    Returns:
+    list of dict: One result per job, in job order
+    """
+    if port is not None:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(path)
+    with sock, sock.makefile('rb') as responses:
+        sock.sendall(b''.join(json.dumps(dict(job, id=idx)).encode('utf-8') + b'\n'
+                              for idx, job in enumerate(jobs)))
+        results = [json.loads(responses.readline()) for _ in jobs]
+    return sorted(results, key=lambda result: result['id'])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve report render jobs from one long-running process.")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help=f"Unix socket to listen on (default {DEFAULT_SOCKET})")
+    parser.add_argument('--port', type=int, help="listen on 127.0.0.1:PORT instead of a Unix socket")
+    parser.add_argument('--submit', metavar='JOBS', help="send the jobs of a JSONL/CSV job file to a running daemon")
+    parser.add_argument('-o', '--output-dir', default='.', help="directory for the generated files")
+    parser.add_argument('-c', '--concurrency', type=int, default=os.cpu_count() or 1,
+                        help="jobs compiled at the same time (default: CPU count)")
+    parser.add_argument('--queue-size', type=int, default=32, help="jobs that may wait before submitters are held back")
+    parser.add_argument('--dpi', type=int, default=200, help="resolution of the preview images")
+    parser.add_argument('--fmt', default='png', help="image format of the previews")
+    parser.add_argument('--backend', choices=['pdf', 'dvi'], default='pdf', help="render through a PDF or a DVI file")
+    parser.add_argument('--cache-dir', help="reuse rendered artifacts from this render cache")
+    parser.add_argument('--cache-size', type=int, default=512, help="render cache size limit in MB")
+    parser.add_argument('--format-dir', help="compile against precompiled preamble formats kept in this directory")
+    parser.add_argument('--spans', metavar='FILE', help="append per-phase timing spans as JSON lines to FILE")
+    args = parser.parse_args()
+
+    if args.submit:
+        from batch import load_jobs
+        for result in submit(load_jobs(args.submit), args.socket, args.port):
+            print(json.dumps(result))
+    else:
+        cache = None
+        if args.cache_dir:
+            cache = RenderCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+        os.makedirs(args.output_dir, exist_ok=True)
+        if args.spans:
+            import instrument
+            instrument.add_sink(instrument.JsonLinesSink(args.spans))
+        preload()
+        daemon = RenderDaemon(args.output_dir, args.concurrency, args.queue_size, cache=cache, dpi=args.dpi,
+                              fmt=args.fmt, backend=args.backend, format_dir=args.format_dir)
+        try:
+            asyncio.run(daemon.serve(args.socket, args.port))
+        except KeyboardInterrupt:
+            pass
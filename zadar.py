@@ -0,0 +1,180 @@
+"""
+Single entry point for the reports, reading its input from files (see
+loaders.py for the formats) and arguments:
+
+    python zadar.py chi-square observed.csv --alpha 0.05
+    python zadar.py regression points.npy
+    python zadar.py median table.csv
+    python zadar.py normal queries.txt --mean 100 --std-dev 15
+
+Nothing but the standard library is imported up front: the report module, scipy,
+pylatex and pdf2image are only imported once the command turns out to need them.
+--import-time prints how long those imports took.
+"""
+import time
+
+_started = time.perf_counter()
+
+import argparse
+import importlib
+import sys
+
+IMPORT_TIMES = {}
+
+def load(name):
+    """
+    Import a module on first use and record how long the import took.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - start
+    return module
+
+def input_options(args):
+    """
+    Keyword arguments for the loaders module from the common input options.
+    """
+    options = {'dtype': args.dtype, 'key': args.key, 'columns': args.columns}
+    return {name: value for name, value in options.items() if value is not None}
+
+def render_options(args):
+    """
+    Keyword arguments for render.render_document from the common command line options.
+    """
+    load('render')
+    if args.backend == 'pdf':
+        load('pdf2image')
+    cache = None
+    if args.cache_dir:
+        cache = load('render_cache').RenderCache(args.cache_dir)
+    return dict(dpi=args.dpi, fmt=args.fmt, backend=args.backend, format_dir=args.format_dir, cache=cache)
+
+def chi_square_command(args):
+    load('scipy.stats')
+    chi_square = load('chi_square')
+    observed = load('loaders').load_contingency_table(args.observed, **input_options(args))
+    if observed.ndim == 2 and observed.shape[0] == 1:
+        observed = observed[0]
+    result = chi_square.chi_square_test(observed, alpha=args.alpha, simulations=args.simulations,
+                                        seed=args.seed, processes=args.processes)
+    simulated = f", simulated p = {result['simulated_p_value']:.4g}" if args.simulations else ''
+    print(f"{result['test_type']}: chi2 = {result['chi2_statistic']:.4f}, "
+          f"dof = {result['degrees_of_freedom']}, p = {result['p_value']:.4g}{simulated}, "
+          f"{'significant' if result['significant'] else 'not significant'} at alpha = {args.alpha}")
+    if args.no_render:
+        return
+    if observed.ndim != 2:
+        raise SystemExit("Only contingency tables (two or more rows) can be rendered as a report")
+    row_labels = args.row_labels or [str(i + 1) for i in range(observed.shape[0])]
+    col_labels = args.col_labels or [chr(ord('A') + i) for i in range(observed.shape[1])]
+    chi_square.generate_latex_document(result['observed'], result['expected'], result['chi2_statistic'].round(2),
+                                       result['degrees_of_freedom'], args.alpha, row_labels, col_labels,
+                                       filename=args.output or 'chi_square',
+                                       simulated_p_value=result.get('simulated_p_value'),
+                                       simulations=result.get('simulations'), **render_options(args))
+
+def regression_command(args):
+    np = load('numpy')
+    regression_stats = load('regression_stats')
+    x_values, y_values = load('loaders').load_xy(args.points, **input_options(args))
+    x_values, y_values = np.round(x_values, 2), np.round(y_values, 2)
+    summary = regression_stats.regression_summary(regression_stats.regression_moments(x_values, y_values))
+    print(f"n = {summary['n']}, mean_x = {summary['mean_x']:.4f}, mean_y = {summary['mean_y']:.4f}, "
+          f"cov = {summary['covariance']:.4f}, r = {summary['correlation']:.4f}")
+    print(f"y = {summary['slope']:.4f}x {summary['intercept']:+.4f}")
+    if not args.no_render:
+        load('linear_regression').generate_latex_document(x_values, y_values, filename=args.output or 'linear_regression',
+                                                          layout=args.layout, max_rows=args.max_rows,
+                                                          **render_options(args))
+
+def median_command(args):
+    frequency_stats = load('frequency_stats')
+    values, frequencies = load('loaders').load_frequency_table(args.table, **input_options(args))
+    stats = frequency_stats.frequency_statistics(values, frequencies)
+    print(f"n = {stats['n']}, mean = {stats['mean']:.4f}, median = {stats['median']}, "
+          f"variance = {stats['variance']:.4f}, std_dev = {stats['std_dev']:.4f}")
+    if not args.no_render:
+        load('median').generate_latex_document(values, frequencies, filename=args.output or 'median',
+                                               layout=args.layout, max_rows=args.max_rows, **render_options(args))
+
+def normal_command(args):
+    if not args.table:
+        load('scipy.stats')
+    normal_distribution = load('normal_distribution')
+    options = {} if args.no_render else render_options(args)
+    normal_distribution.run_queries(args.queries, args.mean, args.std_dev, args.output or 'normal_distribution',
+                                    args.table, not args.no_render, **options)
+
+def build_parser():
+    render = argparse.ArgumentParser(add_help=False)
+    render.add_argument('-o', '--output', help="output file name without extension (default: the report name)")
+    render.add_argument('--no-render', action='store_true', help="only print the results")
+    render.add_argument('--dpi', type=int, default=200, help="resolution of the preview image")
+    render.add_argument('--fmt', default='png', help="image format of the preview")
+    render.add_argument('--backend', choices=['pdf', 'dvi'], default='pdf', help="render through a PDF or a DVI file")
+    render.add_argument('--format-dir', help="compile against precompiled preamble formats kept in this directory")
+    render.add_argument('--cache-dir', help="reuse rendered artifacts from this render cache")
+
+    data = argparse.ArgumentParser(add_help=False)
+    data.add_argument('--dtype', help="element type of raw binary input (.bin/.raw/.dat), e.g. int64 or float64")
+    data.add_argument('--columns', type=int, help="row length of raw binary input")
+    data.add_argument('--key', help="array to read from an .npz archive")
+
+    # Same values as latex_emit.TABLE_LAYOUTS / MAX_TABLE_ROWS, which is not imported up front
+    table = argparse.ArgumentParser(add_help=False)
+    table.add_argument('--layout', choices=['full', 'long', 'binned'],
+                       help="table layout: every row scaled to the page, a long table over pages showing the "
+                            "first and last rows, or summed ranges (default: full up to --max-rows rows, else long)")
+    table.add_argument('--max-rows', type=int, default=50, help="rows printed in the table (default 50)")
+
+    parser = argparse.ArgumentParser(prog='zadar', description="Statistics worksheets rendered as LaTeX reports.")
+    parser.add_argument('--import-time', action='store_true', help="print how long the imports took to stderr")
+    parser.add_argument('--spans', metavar='FILE', help="append per-phase timing spans as JSON lines to FILE")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('chi-square', parents=[render, data], help="chi-square test of a contingency table")
+    command.add_argument('observed', help="observed frequencies (.csv/.txt with one table row per line, .npy, .npz, .bin)")
+    command.add_argument('--alpha', type=float, default=0.05, help="significance level (default 0.05)")
+    command.add_argument('--row-labels', nargs='+', help="row labels (default 1, 2, ...)")
+    command.add_argument('--col-labels', nargs='+', help="column labels (default A, B, ...)")
+    command.add_argument('--simulations', type=int, help="also compute a Monte Carlo p-value from this many tables")
+    command.add_argument('--seed', type=int, help="seed of the simulation, for reproducible p-values")
+    command.add_argument('--processes', type=int, help="worker processes of the simulation")
+    command.set_defaults(run=chi_square_command)
+
+    command = commands.add_parser('regression', parents=[render, data, table], help="linear regression of x, y points")
+    command.add_argument('points', help="x, y columns (.csv/.txt, .npy, .npz, .bin)")
+    command.set_defaults(run=regression_command)
+
+    command = commands.add_parser('median', parents=[render, data, table], help="mean, median and variance of a frequency table")
+    command.add_argument('table', help="value, frequency columns (.csv/.txt, .npy, .npz, .bin)")
+    command.set_defaults(run=median_command)
+
+    command = commands.add_parser('normal', parents=[render], help="normal distribution probabilities")
+    command.add_argument('queries', help="one query per line ('< 100', '<> 109 112'), optionally "
+                                         "prefixed with 'mean std_dev'")
+    command.add_argument('--mean', type=float, help="mean for queries that do not give their own")
+    command.add_argument('--std-dev', type=float, help="standard deviation for queries that do not give their own")
+    command.add_argument('--table', action='store_true', help="look Phi up in a precomputed table instead of SciPy")
+    command.set_defaults(run=normal_command)
+    return parser
+
+def main(argv=None):
+    IMPORT_TIMES['zadar'] = time.perf_counter() - _started
+    args = build_parser().parse_args(argv)
+    load('numpy')  # Every command needs it; loaded first so it is timed on its own
+    if args.spans:
+        instrument = load('instrument')
+        instrument.add_sink(instrument.JsonLinesSink(args.spans))
+    try:
+        args.run(args)
+    finally:
+        if args.import_time:
+            for name, seconds in IMPORT_TIMES.items():
+                print(f"import time: {name:<20}{seconds * 1000:>9.1f} ms", file=sys.stderr)
+            print(f"import time: {'total':<20}{sum(IMPORT_TIMES.values()) * 1000:>9.1f} ms", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()